@@ -0,0 +1,175 @@
+from datetime import datetime, time, timedelta
+from typing import Any
+
+from schemas import CocktailFilter
+
+SERVING_SIZE_STEP = 25
+
+Pipeline = list[dict[str, Any]]
+
+
+def _group_keys(*fields: str) -> dict[str, str]:
+    return {field: f"${field}" for field in fields}
+
+
+def _ungroup_keys(keys: dict[str, Any]) -> dict[str, str]:
+    """Move the grouping keys out of the _id to the top level of the result."""
+    return {key: f"$_id.{key}" for key in keys}
+
+
+def filter_stages(filters: CocktailFilter, date_field: str = "makedate") -> Pipeline:
+    """Build the stages to apply the dashboard filter to the cocktails, the rollups got another date field."""
+    match: dict[str, Any] = {}
+    if filters.countrycodes is not None:
+        match["countrycode"] = {"$in": [code.value for code in filters.countrycodes]}
+    if filters.machines is not None:
+        match["machinename"] = {"$in": filters.machines}
+    if filters.recipes is not None:
+        match["cocktailname"] = {"$in": filters.recipes}
+    made_date: dict[str, datetime] = {}
+    if filters.start is not None:
+        made_date["$gte"] = datetime.combine(filters.start, time.min)
+    if filters.end is not None:
+        # the next day is excluded, otherwise its first hour is included by the hourly rollups
+        made_date["$lt"] = datetime.combine(filters.end + timedelta(days=1), time.min)
+    if made_date:
+        match[date_field] = made_date
+    return [{"$match": match}] if match else []
+
+
+def volume_pipeline(filters: CocktailFilter, country_split: bool) -> Pipeline:
+    """Aggregate by language and machine name, returns total volumes (in litre) and cocktail counts."""
+    keys = _group_keys("countrycode", "machinename") if country_split else _group_keys("machinename")
+    return [
+        *filter_stages(filters),
+        {"$group": {"_id": keys, "volume": {"$sum": "$volume"}, "count": {"$sum": 1}}},
+        {"$sort": {"volume": -1, "count": -1, "_id": 1}},
+        {"$project": {"_id": 0, **_ungroup_keys(keys), "volume": {"$divide": ["$volume", 1000]}, "count": 1}},
+    ]
+
+
+def recipe_pipeline(filters: CocktailFilter, limit_recipe: int, country_split: bool) -> Pipeline:
+    """Aggregate by cocktail name and language, limits to the x most used recipes."""
+    if not country_split:
+        return [
+            *filter_stages(filters),
+            {"$group": {"_id": "$cocktailname", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": limit_recipe},
+            {"$project": {"_id": 0, "cocktailname": "$_id", "count": 1}},
+        ]
+    # the recipes are ranked by their total count, languages are then ordered within each recipe
+    return [
+        *filter_stages(filters),
+        {"$group": {"_id": _group_keys("cocktailname", "countrycode"), "count": {"$sum": 1}}},
+        {
+            "$group": {
+                "_id": "$_id.cocktailname",
+                "total": {"$sum": "$count"},
+                "languages": {"$push": {"countrycode": "$_id.countrycode", "count": "$count"}},
+            }
+        },
+        {"$sort": {"total": -1, "_id": 1}},
+        {"$limit": limit_recipe},
+        {"$unwind": "$languages"},
+        {"$sort": {"total": -1, "_id": 1, "languages.count": -1}},
+        {
+            "$project": {
+                "_id": 0,
+                "cocktailname": "$_id",
+                "countrycode": "$languages.countrycode",
+                "count": "$languages.count",
+            }
+        },
+    ]
+
+
+def time_pipeline(filters: CocktailFilter, hour_grouping: bool, machine_grouping: bool) -> Pipeline:
+    """Aggregate the cocktail count either by day or hour, optionally split by machine."""
+    keys: dict[str, Any] = {"date": {"$dateTrunc": {"date": "$makedate", "unit": "hour" if hour_grouping else "day"}}}
+    if machine_grouping:
+        keys |= _group_keys("machinename")
+    return [
+        *filter_stages(filters),
+        # dates still stored as string (not yet migrated) can not be truncated
+        {"$match": {"makedate": {"$type": "date"}}},
+        {"$group": {"_id": keys, "count": {"$sum": 1}}},
+        {"$sort": {"_id.date": 1, "_id.machinename": 1}},
+        {"$project": {"_id": 0, **_ungroup_keys(keys), "count": 1}},
+    ]
+
+
+def serving_pipeline(filters: CocktailFilter, machine_split: bool, min_count: int) -> Pipeline:
+    """Aggregate by serving sizes, only sizes with at least min_count cocktails are included."""
+    # $round rounds half to even, like the python round used in the dashboard
+    serving_size = {
+        "$toInt": {"$multiply": [{"$round": [{"$divide": ["$volume", SERVING_SIZE_STEP]}, 0]}, SERVING_SIZE_STEP]}
+    }
+    keys: dict[str, Any] = {"volume": serving_size}
+    if machine_split:
+        keys |= _group_keys("machinename")
+    return [
+        *filter_stages(filters),
+        {"$group": {"_id": keys, "count": {"$sum": 1}}},
+        # the minimal count applies to the serving size, regardless of the machine split
+        {
+            "$group": {
+                "_id": "$_id.volume",
+                "total": {"$sum": "$count"},
+                "machines": {"$push": {"machinename": "$_id.machinename", "count": "$count"}},
+            }
+        },
+        {"$match": {"total": {"$gte": min_count}}},
+        {"$unwind": "$machines"},
+        {"$sort": {"_id": 1, "machines.machinename": 1}},
+        {
+            "$project": {
+                "_id": 0,
+                "volume": "$_id",
+                "machinename": "$machines.machinename",
+                "count": "$machines.count",
+            }
+        },
+    ]
+
+
+def rollup_pipeline(filters: CocktailFilter, daily_collection: str, unit: str, group_by: list[str]) -> Pipeline:
+    """Aggregate the hourly and daily rollups by hour or day and the given keys, returns counts and volumes (in litre).
+
+    Only the rollups of the last days are hourly, older ones are grouped at the start of the day.
+    """
+    keys: dict[str, Any] = {"date": {"$dateTrunc": {"date": "$date", "unit": unit}}} | _group_keys(*group_by)
+    match_stages = filter_stages(filters, date_field="date")
+    return [
+        *match_stages,
+        {"$unionWith": {"coll": daily_collection, "pipeline": match_stages}},
+        {"$group": {"_id": keys, "count": {"$sum": "$cocktails"}, "volume": {"$sum": "$volume"}}},
+        {"$sort": {"_id.date": 1, **dict.fromkeys((f"_id.{key}" for key in group_by), 1)}},
+        {"$project": {"_id": 0, **_ungroup_keys(keys), "count": 1, "volume": {"$divide": ["$volume", 1000]}}},
+    ]
+
+
+def installation_pipeline() -> Pipeline:
+    """Aggregate the installations by the unified operating system name."""
+    # there may be the name Raspbian or Debian, for both the Raspberry Pi OS, so we need to unify them
+    unified_debian = {"$replaceAll": {"input": "$os", "find": "Raspbian ", "replacement": "Debian "}}
+    # convert all entries of os having "Armbian" in the name to "Armbian"
+    unified_os = {
+        "$let": {
+            "vars": {"os": unified_debian, "armbian": {"$indexOfCP": [unified_debian, "Armbian"]}},
+            "in": {
+                "$cond": [
+                    {"$gte": ["$$armbian", 0]},
+                    {"$concat": [{"$substrCP": ["$$os", 0, "$$armbian"]}, "Armbian (all)"]},
+                    "$$os",
+                ]
+            },
+        }
+    }
+    return [
+        {"$group": {"_id": unified_os, "count": {"$sum": 1}}},
+        # it might be that there is an empty string for the os, we need to remove those
+        {"$match": {"_id": {"$ne": ""}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$project": {"_id": 0, "os": "$_id", "count": 1}},
+    ]
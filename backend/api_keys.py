@@ -0,0 +1,40 @@
+"""Administration of the API keys, run with `uv run python api_keys.py` in the backend folder."""
+
+import argparse
+import asyncio
+import logging
+import sys
+
+from database import init_database
+from environment import CONNECTION_STRING
+from pymongo import AsyncMongoClient
+from security import API_KEY_CACHE_TTL, revoke_api_key
+from utils import setup_logging
+
+_logger = logging.getLogger(__name__)
+
+
+async def _revoke(api_key: str) -> bool:
+    mongodb_client: AsyncMongoClient = AsyncMongoClient(CONNECTION_STRING)
+    try:
+        await init_database(mongodb_client)
+        revoked = await revoke_api_key(api_key)
+    finally:
+        await mongodb_client.close()
+    if not revoked:
+        _logger.error("The API key does not exist")
+        return False
+    # the running app caches the looked up keys, so it is not rejected there right away
+    _logger.info("Revoked the API key, the app rejects it within %s seconds", API_KEY_CACHE_TTL)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the API keys of the machines.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    revoke = commands.add_parser("revoke", help="Mark the API key as invalid, so it can not send data anymore.")
+    revoke.add_argument("api_key", help="The API key to revoke.")
+    args = parser.parse_args()
+    setup_logging()
+    if not asyncio.run(_revoke(args.api_key)):
+        sys.exit(1)
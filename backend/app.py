@@ -1,36 +1,68 @@
+import asyncio
 import logging
+import time
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 
-from beanie import init_beanie
 from core.metadata import DESCRIPTION, TAGS_METADATA, VERSION, Tags
-from environment import CONNECTION_STRING, is_dev
+from database import check_cocktail_layout, create_clients, ensure_indexes, init_database
 from fastapi import FastAPI
-from models import ApiKeyDocument, CocktailDocument, InstallationDocument
-from pymongo import AsyncMongoClient
+from fastapi.middleware.gzip import GZipMiddleware
+from health import READ_CLIENT, WRITE_CLIENT, health_monitor, health_router, pool_stats, process_uptime
+from ingest import ingest_buffer
+from maintenance import BUILD_SUMMARY_JOB, maintenance_scheduler
 from routes import public_router, router
-from utils import run_cleanup, setup_logging
+from utils import setup_logging
 
 _logger = logging.getLogger(__name__)
+# measured once all modules are loaded
+IMPORT_TIME = process_uptime()
 
 
 @asynccontextmanager
 async def db_lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Startup
-    mongodb_client: AsyncMongoClient = AsyncMongoClient(CONNECTION_STRING)
-    database = mongodb_client.get_database("cocktailberry" + ("_dev" if is_dev else ""))
-    await init_beanie(database, document_models=[CocktailDocument, InstallationDocument, ApiKeyDocument])
-    ping_response = await database.command("ping")
-    if int(ping_response["ok"]) != 1:
-        raise Exception("Problem connecting to database cluster.")
-    else:
-        _logger.info("Connected to database cluster.")
-    await run_cleanup()
+    started = time.perf_counter()
+    # the ingest uses the write client, the public reads the read client, each with their own pool
+    mongodb_client, read_client = create_clients(pool_stats[WRITE_CLIENT], pool_stats[READ_CLIENT])
+    await init_database(mongodb_client, read_client)
+    await check_cocktail_layout()
+    health_monitor.start({WRITE_CLIENT: mongodb_client, READ_CLIENT: read_client})
+    maintenance_scheduler.start()
+    if ingest_buffer.enabled:
+        ingest_buffer.start()
+    # the app works without the work deferred to the background, so requests can be served already
+    deferred = asyncio.create_task(_run_deferred_startup(started))
+    startup = health_monitor.startup
+    startup.imports = IMPORT_TIME
+    startup.startup = time.perf_counter() - started
+    startup.cold_start = process_uptime()
+    _logger.info("Startup timing (seconds): %s", startup)
 
     yield
 
     # Shutdown
+    deferred.cancel()
+    await maintenance_scheduler.stop()
+    await ingest_buffer.stop()
+    await health_monitor.stop()
     await mongodb_client.close()
+    await read_client.close()
+
+
+async def _run_deferred_startup(started: float) -> None:
+    """Work not needed to serve requests, like the index check (which may take a while on big collections).
+
+    Building the summary reads all cocktails, until then the stats summary only contains the new data.
+    Only one worker builds it, the others skip it.
+    """
+    await ensure_indexes()
+    try:
+        await maintenance_scheduler.run_job(BUILD_SUMMARY_JOB)
+    except Exception:
+        _logger.exception("Could not build the summary")
+    health_monitor.startup.deferred = time.perf_counter() - started
+    _logger.info("Deferred startup work done, timing (seconds): %s", health_monitor.startup)
 
 
 setup_logging()
@@ -42,8 +74,11 @@ app = FastAPI(
     openapi_tags=TAGS_METADATA,
     lifespan=db_lifespan,
 )
+# bigger responses like the cocktail data are compressed, if the client supports it
+app.add_middleware(GZipMiddleware, minimum_size=1000)
 app.include_router(router)
 app.include_router(public_router)
+app.include_router(health_router)
 
 
 @app.get("/version", tags=[Tags.PUBLIC])
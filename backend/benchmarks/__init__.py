@@ -0,0 +1,13 @@
+"""Benchmarks of the API with synthetic data, see the docs for how to run them."""
+
+import os
+
+# never run against the real database, the benchmark database is dropped when seeding
+os.environ["ATLAS_URI"] = os.getenv("BENCHMARK_URI", "mongodb://localhost:27018")
+os.environ["READ_URI"] = os.environ["ATLAS_URI"]
+os.environ["DATABASE_NAME"] = "cocktailberry_benchmark"
+# the load is generated with a single api key
+os.environ["INGEST_QUOTA_RATE"] = "1000000"
+os.environ["INGEST_QUOTA_BURST"] = "1000000"
+# the routes should do their work, set it to benchmark with the response cache
+os.environ.setdefault("RESPONSE_CACHE_SIZE_MB", "0")
@@ -0,0 +1,132 @@
+"""Synthetic cocktail and installation data, shaped like the data CocktailBerry machines send."""
+
+import random
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from bson import ObjectId
+from schemas import DATEFORMAT_STR
+
+RECIPES = [
+    "Cuba Libre", "Tequila Sunrise", "Swimming Pool", "Mojito", "Sex on the Beach", "Long Island Iced Tea",
+    "Pina Colada", "Caipirinha", "Mai Tai", "Zombie", "Gin Tonic", "Moscow Mule", "Hugo", "Aperol Spritz",
+    "Blue Lagoon", "Planters Punch", "Sky Fizz", "Touchdown", "Hurricane", "Bahama Mama", "Screwdriver",
+    "Vodka Sunrise", "Malibu Sunset", "Batida de Coco", "Tropical Dream", "Virgin Colada", "Ipanema",
+    "Shirley Temple", "Cosmopolitan", "Margarita", "Whiskey Sour", "Daiquiri", "Mint Julep", "Sea Breeze",
+    "Bloody Mary", "Tom Collins", "Paloma", "Dark n Stormy", "Negroni", "Gin Fizz",
+]  # fmt: skip
+# like real data, a few recipes are made most of the time
+RECIPE_WEIGHTS = [1 / (rank + 1) for rank in range(len(RECIPES))]
+LANGUAGES = ["en", "de"]
+LANGUAGE_WEIGHTS = [0.4, 0.6]
+SERVING_SIZES = [100, 150, 200, 250, 300, 350, 400]
+SERVING_WEIGHTS = [0.05, 0.1, 0.3, 0.25, 0.2, 0.07, 0.03]
+# most cocktails are made in the evening
+HOUR_WEIGHTS = [4, 3, 2, 1, 0.5, 0.2, 0.2, 0.2, 0.3, 0.4, 0.5, 0.7, 1, 1, 1, 1.2, 1.5, 2, 3, 4.5, 6, 7, 7, 6]
+OPERATING_SYSTEMS = [
+    "Debian GNU/Linux 12 (bookworm)",
+    "Raspbian GNU/Linux 11 (bullseye)",
+    "Raspbian GNU/Linux 10 (buster)",
+    "Armbian 23.8.1 Bookworm",
+    "Armbian 24.2.1 Jammy",
+    "Ubuntu 22.04.3 LTS",
+    "Windows 10",
+    "",
+]
+OPERATING_SYSTEM_WEIGHTS = [0.45, 0.2, 0.05, 0.05, 0.03, 0.1, 0.1, 0.02]
+# share of the cocktails made while testing, which get deleted, and sent after being offline for some time
+TEST_COCKTAIL_SHARE = 0.005
+OFFLINE_SHARE = 0.05
+COCKTAILS_PER_MACHINE = 2000
+
+
+def machines(count: int) -> list[tuple[str, str, str]]:
+    """Get the name, language and api key name of the machines."""
+    rng = random.Random(count)
+    return [
+        (f"Machine {number}", rng.choices(LANGUAGES, LANGUAGE_WEIGHTS)[0], f"key {number // 3}")
+        for number in range(count)
+    ]
+
+
+def _object_id(date: datetime) -> ObjectId:
+    """Id created at the date (dates are stored in UTC without timezone), like the id of a cocktail received then."""
+    timestamp = int(date.replace(tzinfo=UTC).timestamp())
+    return ObjectId(timestamp.to_bytes(4, "big") + ObjectId().binary[4:])
+
+
+def cocktail_batches(
+    count: int, start: datetime, end: datetime, batch_size: int = 10_000, seed: int = 42
+) -> Iterator[list[dict[str, Any]]]:
+    """Generate the cocktail documents in insertion order, batch wise.
+
+    Each batch covers the next part of the time range, sorted by the receivedate.
+    """
+    rng = random.Random(seed)
+    machine_list = machines(max(1, count // COCKTAILS_PER_MACHINE))
+    # some machines are used a lot more than others
+    machine_weights = [rng.paretovariate(1.2) for _ in machine_list]
+    batches = max(1, -(-count // batch_size))
+    span = (end - start) / batches
+    for index in range(batches):
+        size = min(batch_size, count - index * batch_size)
+        batch_start = start + span * index
+        days = max(1, span.days)
+        hours = rng.choices(range(24), HOUR_WEIGHTS, k=size)
+        chosen_machines = rng.choices(machine_list, machine_weights, k=size)
+        recipes = rng.choices(RECIPES, RECIPE_WEIGHTS, k=size)
+        servings = rng.choices(SERVING_SIZES, SERVING_WEIGHTS, k=size)
+        documents: list[dict[str, Any]] = []
+        for hour, (machinename, countrycode, keyname), recipe, serving in zip(
+            hours, chosen_machines, recipes, servings, strict=True
+        ):
+            made = datetime.combine(
+                (batch_start + timedelta(days=rng.randrange(days))).date(), datetime.min.time()
+            ) + timedelta(hours=hour, minutes=rng.randrange(60))
+            made = min(made, end)
+            offline = rng.random() < OFFLINE_SHARE
+            delay = timedelta(hours=rng.uniform(1, 72)) if offline else timedelta(seconds=rng.uniform(0.5, 30))
+            # nothing is received in the future
+            received = min(made + delay, end)
+            documents.append(
+                {
+                    "_id": _object_id(received),
+                    "cocktailname": "Testcocktail" if rng.random() < TEST_COCKTAIL_SHARE else recipe,
+                    # the pumps are not exact, so the volumes differ a bit from the serving size
+                    "volume": serving + rng.randint(-5, 5),
+                    "machinename": machinename,
+                    "countrycode": countrycode,
+                    "keyname": keyname,
+                    "makedate": made,
+                    "receivedate": received,
+                }
+            )
+        documents.sort(key=lambda document: document["receivedate"])
+        yield documents
+
+
+def installation_batches(
+    count: int, start: datetime, end: datetime, batch_size: int = 10_000, seed: int = 42
+) -> Iterator[list[dict[str, Any]]]:
+    """Generate the installation documents in insertion order, batch wise."""
+    rng = random.Random(seed)
+    seconds = (end - start).total_seconds()
+    dates = sorted(start + timedelta(seconds=rng.uniform(0, seconds)) for _ in range(count))
+    systems = rng.choices(OPERATING_SYSTEMS, OPERATING_SYSTEM_WEIGHTS, k=count)
+    for offset in range(0, count, batch_size):
+        yield [
+            {"_id": _object_id(date), "os": os, "receivedate": date}
+            for date, os in zip(dates[offset : offset + batch_size], systems[offset : offset + batch_size], strict=True)
+        ]
+
+
+def cocktail_payload(rng: random.Random, made: datetime) -> dict[str, Any]:
+    """Get the data a machine sends for a new cocktail."""
+    return {
+        "cocktailname": rng.choices(RECIPES, RECIPE_WEIGHTS)[0],
+        "volume": rng.choices(SERVING_SIZES, SERVING_WEIGHTS)[0],
+        "machinename": f"Machine {rng.randrange(50)}",
+        "countrycode": rng.choices(LANGUAGES, LANGUAGE_WEIGHTS)[0],
+        "makedate": made.strftime(DATEFORMAT_STR),
+    }
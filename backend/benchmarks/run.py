@@ -0,0 +1,232 @@
+"""Load test of the API with the seeded data, run with `uv run python -m benchmarks.run` in the backend folder.
+
+The app runs in this process and gets the requests over ASGI, so the numbers contain no network overhead.
+The memory is the one of the whole process, including the client.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import httpx
+from app import app
+from environment import COCKTAIL_TIMESERIES, RESPONSE_CACHE_SIZE
+from utils import setup_logging
+
+from benchmarks.data import cocktail_payload
+from benchmarks.seed import BENCHMARK_API_KEY, _run_seed, add_scale_arguments, installation_count
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+# interval of the memory samples in seconds
+RSS_SAMPLE_INTERVAL = 0.05
+BATCH_INGEST_SIZE = 100
+ARROW_HEADERS = {"accept": "application/vnd.apache.arrow.stream"}
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """Requests to one route, sent by concurrent workers, the body is built for each request."""
+
+    name: str
+    method: str
+    path: str
+    requests: int
+    concurrency: int
+    params: dict[str, Any] = field(default_factory=dict)
+    headers: dict[str, str] = field(default_factory=dict)
+    body: Callable[[random.Random], Any] | None = None
+
+
+def _single_cocktail(rng: random.Random) -> dict[str, Any]:
+    return cocktail_payload(rng, datetime.now())
+
+
+def _cocktail_batch(rng: random.Random) -> list[dict[str, Any]]:
+    return [cocktail_payload(rng, datetime.now()) for _ in range(BATCH_INGEST_SIZE)]
+
+
+def build_phases(requests: int, full_requests: int, concurrency: int) -> list[list[Scenario]]:
+    """Get the phases of the benchmark, the scenarios of a phase run at the same time.
+
+    Downloading all data is a lot heavier than the other routes, so it is only done a few times.
+    """
+    api_key = {"x-api-key": BENCHMARK_API_KEY}
+    public = "/api/v1/public"
+
+    def read(name: str, path: str, **options: Any) -> Scenario:
+        return Scenario(name, "GET", f"{public}{path}", requests, concurrency, **options)
+
+    def ingest(name: str, path: str, body: Callable[[random.Random], Any]) -> Scenario:
+        return Scenario(name, "POST", f"/api/v1{path}", requests, concurrency, headers=api_key, body=body)
+
+    full_download = Scenario("cocktails_json", "GET", f"{public}/cocktails", full_requests, 1)
+    single_ingest = ingest("ingest_single", "/cocktail", _single_cocktail)
+    page = read("cocktails_page", "/cocktails", params={"limit": 1000})
+    volume = read("stats_volume", "/stats/volume")
+    return [
+        [full_download],
+        [replace(full_download, name="cocktails_arrow", headers=ARROW_HEADERS)],
+        [page],
+        [read("installations", "/installations")],
+        [read("stats_summary", "/stats/summary")],
+        [volume],
+        [read("stats_recipes", "/stats/recipes", params={"country_split": True})],
+        [read("stats_time", "/stats/time", params={"hour_grouping": True})],
+        [read("stats_servings", "/stats/servings")],
+        [read("stats_rollups", "/stats/rollups", params={"group_by": "machinename"})],
+        [single_ingest],
+        [ingest("ingest_batch", "/cocktails/batch", _cocktail_batch)],
+        # ingest while the dashboard reads
+        [replace(scenario, name=f"mixed_{scenario.name}") for scenario in (single_ingest, page, volume)],
+    ]
+
+
+def _rss() -> int:
+    """Get the current resident memory in bytes, or the peak if the os does not provide the current one."""
+    try:
+        resident_pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return resident_pages * resource.getpagesize()
+    except OSError:
+        # kilobytes on linux, bytes on macos
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def _sample_rss(peak: list[int]) -> None:
+    while True:
+        peak[0] = max(peak[0], _rss())
+        await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+
+async def _run_scenario(client: httpx.AsyncClient, scenario: Scenario, rng: random.Random) -> dict[str, Any]:
+    """Send the requests of the scenario and get its latencies and throughput."""
+    pending = iter(range(scenario.requests))
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        # the workers share the iterator, so each request is sent once
+        for _ in pending:
+            body = scenario.body(rng) if scenario.body is not None else None
+            started = time.perf_counter()
+            response = await client.request(
+                scenario.method, scenario.path, params=scenario.params, headers=scenario.headers, json=body
+            )
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:  # noqa: PLR2004
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(scenario.concurrency)))
+    duration = time.perf_counter() - started
+    # quantiles needs at least two values
+    percentiles = statistics.quantiles(latencies * 2 if len(latencies) == 1 else latencies, n=100, method="inclusive")
+    return {
+        "route": f"{scenario.method} {scenario.path}",
+        "requests": scenario.requests,
+        "concurrency": scenario.concurrency,
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(scenario.requests / duration, 2),
+        "p50_ms": round(percentiles[49] * 1000, 2),
+        "p95_ms": round(percentiles[94] * 1000, 2),
+        "p99_ms": round(percentiles[98] * 1000, 2),
+    }
+
+
+async def run_benchmark(phases: list[list[Scenario]]) -> dict[str, dict[str, Any]]:
+    """Run the phases one after another against the app, with the app started like in production."""
+    results: dict[str, dict[str, Any]] = {}
+    rng = random.Random(42)
+    transport = httpx.ASGITransport(app=app)
+    async with (
+        app.router.lifespan_context(app),
+        httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client,
+    ):
+        for phase in phases:
+            peak = [_rss()]
+            sampler = asyncio.create_task(_sample_rss(peak))
+            phase_results = await asyncio.gather(*(_run_scenario(client, scenario, rng) for scenario in phase))
+            sampler.cancel()
+            for scenario, result in zip(phase, phase_results, strict=True):
+                results[scenario.name] = result | {"peak_rss_mb": round(peak[0] / 1024**2, 1)}
+                _logger.info("%s: %s", scenario.name, results[scenario.name])
+    return results
+
+
+def compare(results: dict[str, dict[str, Any]], baseline: dict[str, dict[str, Any]], tolerance: float) -> list[str]:
+    """Print the change against the baseline, returns the scenarios which got slower than the tolerance."""
+    regressions = []
+    print(f"{'scenario':<24}{'p95 ms':>12}{'baseline':>12}{'change':>10}{'rps':>12}{'baseline':>12}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = result["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] > 0 else 0.0
+        print(
+            f"{name:<24}{result['p95_ms']:>12.2f}{before['p95_ms']:>12.2f}{change:>10.1%}"
+            f"{result['throughput_rps']:>12.2f}{before['throughput_rps']:>12.2f}"
+        )
+        if change > tolerance or result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the API with synthetic data.")
+    add_scale_arguments(parser)
+    parser.add_argument("--no-seed", action="store_true", help="Use the already seeded data.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+    parser.add_argument("--full-requests", type=int, default=3, help="Requests of the scenarios loading all data.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent requests per scenario.")
+    parser.add_argument("--output", type=Path, default=DEFAULT_BASELINE, help="File to write the results to.")
+    parser.add_argument("--compare", type=Path, help="Baseline file to compare the results with.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown against the baseline.")
+    args = parser.parse_args()
+    setup_logging()
+    if not args.no_seed:
+        asyncio.run(_run_seed(args.cocktails, installation_count(args), args.days))
+    phases = build_phases(args.requests, args.full_requests, args.concurrency)
+    results = asyncio.run(run_benchmark(phases))
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "cocktails": args.cocktails,
+            "installations": installation_count(args),
+            "seeded": not args.no_seed,
+            "timeseries": COCKTAIL_TIMESERIES,
+            "response_cache": RESPONSE_CACHE_SIZE > 0,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2) + "\n")
+    _logger.info("Saved the results to %s", args.output)
+    if args.compare is None:
+        return 0
+    baseline = json.loads(args.compare.read_text())["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        _logger.error("Slower than the baseline: %s", ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
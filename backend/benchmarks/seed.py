@@ -0,0 +1,75 @@
+"""Seed the benchmark database with synthetic data, run `uv run python -m benchmarks.seed` in the backend folder."""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+import rollups
+from database import ensure_indexes, get_database, init_database
+from environment import CONNECTION_STRING
+from models import ApiKeyDocument, CocktailDocument, InstallationDocument
+from pymongo import AsyncMongoClient
+from summary import ensure_summary
+from utils import setup_logging, utc_now
+
+from benchmarks.data import cocktail_batches, installation_batches
+
+_logger = logging.getLogger(__name__)
+
+BENCHMARK_API_KEY = "benchmark-api-key"
+
+
+async def seed(mongodb_client: AsyncMongoClient, cocktails: int, installations: int, days: int) -> None:
+    """Replace the benchmark database with the given number of cocktails and installations of the last days.
+
+    The summary and the rollups are built as well, like they would be after inserting the data over the API.
+    """
+    database = get_database(mongodb_client)
+    if "benchmark" not in database.name:
+        raise ValueError(f"Refusing to drop the database {database.name}, it is not a benchmark database")
+    await mongodb_client.drop_database(database.name)
+    # creates the collections again, the cocktails as time series if configured
+    await init_database(mongodb_client)
+    end = utc_now()
+    start = end - timedelta(days=days)
+    started = time.perf_counter()
+    inserted = 0
+    for batch in cocktail_batches(cocktails, start, end):
+        await CocktailDocument.get_pymongo_collection().insert_many(batch, ordered=False)
+        inserted += len(batch)
+        _logger.info("Inserted %s of %s cocktails", inserted, cocktails)
+    for batch in installation_batches(installations, start, end):
+        await InstallationDocument.get_pymongo_collection().insert_many(batch, ordered=False)
+    await ApiKeyDocument(name="benchmark", api_key=BENCHMARK_API_KEY).create()
+    await ensure_indexes()
+    await ensure_summary()
+    await rollups.rebuild_rollups()
+    _logger.info("Seeded the benchmark database in %.1f s", time.perf_counter() - started)
+
+
+async def _run_seed(cocktails: int, installations: int, days: int) -> None:
+    mongodb_client: AsyncMongoClient = AsyncMongoClient(CONNECTION_STRING)
+    try:
+        await seed(mongodb_client, cocktails, installations, days)
+    finally:
+        await mongodb_client.close()
+
+
+def add_scale_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--cocktails", type=int, default=100_000, help="Number of cocktails to seed.")
+    parser.add_argument("--installations", type=int, default=None, help="Number of installations, default 1 %%.")
+    parser.add_argument("--days", type=int, default=730, help="Days the data is spread over.")
+
+
+def installation_count(args: argparse.Namespace) -> int:
+    return args.installations if args.installations is not None else max(1, args.cocktails // 100)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the benchmark database with synthetic data.")
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+    setup_logging()
+    asyncio.run(_run_seed(args.cocktails, installation_count(args), args.days))
@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Protocol
+
+from environment import RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from models import ResponseCacheDocument
+from utils import utc_now
+
+_logger = logging.getLogger(__name__)
+
+COCKTAILS_CACHE = "cocktails"
+INSTALLATIONS_CACHE = "installations"
+# documents are limited to 16 MB, bigger responses are not stored in the database
+MAX_DOCUMENT_BODY_SIZE = 15 * 1024 * 1024
+
+
+@dataclass
+class CachedResponse:
+    """Serialized response, which can be sent again as it is."""
+
+    body: bytes
+    media_type: str
+    headers: dict[str, str] = field(default_factory=dict)
+
+    def to_response(self) -> Response:
+        return Response(content=self.body, media_type=self.media_type, headers=self.headers)
+
+
+class CacheBackend(Protocol):
+    """Storage of the cached responses, keys start with their namespace."""
+
+    # bodies bigger than this are not stored, 0 disables the cache
+    max_body_size: int
+
+    async def get(self, key: str) -> CachedResponse | None: ...
+
+    async def set(self, key: str, namespace: str, value: CachedResponse) -> None: ...
+
+    async def invalidate(self, namespace: str) -> None: ...
+
+
+class MemoryCacheBackend:
+    """Cache in the memory of the process, the least recently used entries are dropped if it gets too big."""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.max_body_size = max_size
+        self.ttl = ttl
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[float, str, CachedResponse]] = OrderedDict()
+
+    async def get(self, key: str) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, namespace: str, value: CachedResponse) -> None:
+        if len(value.body) > self.max_size:
+            return
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, namespace, value)
+        self.size += len(value.body)
+        while self.size > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    async def invalidate(self, namespace: str) -> None:
+        for key in [key for key, (_, entry_namespace, _) in self._entries.items() if entry_namespace == namespace]:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[2].body)
+
+
+class MongoCacheBackend:
+    """Cache in the database, so all workers share it, expired entries are removed by a TTL index."""
+
+    def __init__(self, ttl: float) -> None:
+        self.max_body_size = MAX_DOCUMENT_BODY_SIZE
+        self.ttl = ttl
+
+    async def get(self, key: str) -> CachedResponse | None:
+        entry = await ResponseCacheDocument.get(key)
+        # the TTL index only runs every minute, it compares the dates as UTC
+        if entry is None or entry.expires_at < utc_now():
+            return None
+        return CachedResponse(entry.body, entry.media_type, entry.headers)
+
+    async def set(self, key: str, namespace: str, value: CachedResponse) -> None:
+        if len(value.body) > MAX_DOCUMENT_BODY_SIZE:
+            return
+        await ResponseCacheDocument(
+            id=key,
+            namespace=namespace,
+            body=value.body,
+            media_type=value.media_type,
+            headers=value.headers,
+            expires_at=utc_now() + timedelta(seconds=self.ttl),
+        ).save()
+
+    async def invalidate(self, namespace: str) -> None:
+        await ResponseCacheDocument.get_pymongo_collection().delete_many({"namespace": namespace})
+
+
+class _SharedResponse:
+    """Response which is still built, each client streams the chunks from the start as they arrive."""
+
+    def __init__(self, status_code: int, headers: dict[str, str], media_type: str | None) -> None:
+        self.status_code = status_code
+        self.headers = headers
+        self.media_type = media_type
+        self.chunks: list[bytes] = []
+        self.size = 0
+        self.done = False
+        self.error: Exception | None = None
+        self._arrived: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+
+    def add(self, chunk: bytes) -> None:
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        self._notify()
+
+    def finish(self, error: Exception | None = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def to_cached(self) -> CachedResponse:
+        return CachedResponse(b"".join(self.chunks), self.media_type or "", self.headers)
+
+    def to_response(self) -> Response:
+        if self.done and self.error is None:
+            return Response(b"".join(self.chunks), self.status_code, self.headers, self.media_type)
+        return StreamingResponse(self._stream(), self.status_code, self.headers, self.media_type)
+
+    async def _stream(self) -> AsyncIterator[bytes]:
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.error is not None:
+                raise RuntimeError("Building the response failed") from self.error
+            if self.done:
+                return
+            # shield, so a client disconnecting does not cancel the wait of the others
+            await asyncio.shield(self._arrived)
+
+    def _notify(self) -> None:
+        arrived, self._arrived = self._arrived, asyncio.get_running_loop().create_future()
+        arrived.set_result(None)
+
+
+class ResponseCache:
+    """Cache for the serialized responses of the public data routes.
+
+    The key should contain the version of the data, so changed data is never served, even by other workers.
+    A missed response is built once, concurrent misses of the same key get the same response (single flight).
+    A streamed body is read in the background and its chunks are passed to all these clients as they arrive,
+    so bodies too big to be stored are not built again for each of them. It is stored once it is complete.
+    """
+
+    def __init__(self, backend: CacheBackend) -> None:
+        self.backend = backend
+        self._building: dict[str, asyncio.Future[_SharedResponse | None]] = {}
+        # the running reads, so they are not garbage collected
+        self._tasks: set[asyncio.Task] = set()
+
+    async def get_or_build(self, namespace: str, key: str, build: Callable[[], Awaitable[Response]]) -> Response:
+        key = f"{namespace}:{key}"
+        cached = await self.backend.get(key)
+        if cached is not None:
+            return cached.to_response()
+        if self.backend.max_body_size <= 0:
+            return await build()
+        building = self._building.get(key)
+        if building is not None:
+            # shield, so a client disconnecting does not cancel the wait of the others
+            shared = await asyncio.shield(building)
+            return shared.to_response() if shared is not None else await build()
+        building = asyncio.get_running_loop().create_future()
+        self._building[key] = building
+        try:
+            response = await build()
+        except BaseException:
+            self._release(key, building)
+            building.set_result(None)
+            raise
+        shared = _SharedResponse(response.status_code, _own_headers(response), response.media_type)
+        building.set_result(shared)
+        if not isinstance(response, StreamingResponse):
+            shared.add(bytes(response.body))
+            shared.finish()
+            self._release(key, building)
+            await self._store(namespace, key, shared)
+            return response
+        task = asyncio.create_task(self._read(namespace, key, building, shared, response))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return shared.to_response()
+
+    async def invalidate(self, namespace: str) -> None:
+        """Drop the entries of outdated data, so they do not take up space until they expire."""
+        await self.backend.invalidate(namespace)
+
+    async def _read(
+        self,
+        namespace: str,
+        key: str,
+        building: asyncio.Future[_SharedResponse | None],
+        shared: _SharedResponse,
+        response: StreamingResponse,
+    ) -> None:
+        """Read the body for all clients of the key, it is read completely even if they disconnect."""
+        try:
+            async for chunk in response.body_iterator:
+                shared.add(chunk.encode() if isinstance(chunk, str) else bytes(chunk))
+        except Exception as err:
+            _logger.exception("Could not build the response %s", key)
+            shared.finish(err)
+            return
+        finally:
+            self._release(key, building)
+        shared.finish()
+        await self._store(namespace, key, shared)
+
+    async def _store(self, namespace: str, key: str, shared: _SharedResponse) -> None:
+        if shared.size > self.backend.max_body_size:
+            return
+        try:
+            await self.backend.set(key, namespace, shared.to_cached())
+        except Exception:
+            _logger.exception("Could not store the response %s", key)
+
+    def _release(self, key: str, building: asyncio.Future[_SharedResponse | None]) -> None:
+        """Let the next misses build the response again."""
+        if self._building.get(key) is building:
+            del self._building[key]
+
+
+def _own_headers(response: Response) -> dict[str, str]:
+    """Get the headers set by the route, the content headers are set again for the cached body."""
+    return {
+        name: value
+        for name, value in response.headers.items()
+        if name.lower() not in {"content-length", "content-type"}
+    }
+
+
+def _create_backend() -> CacheBackend:
+    if RESPONSE_CACHE_BACKEND == "mongo":
+        return MongoCacheBackend(RESPONSE_CACHE_TTL)
+    return MemoryCacheBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+
+
+response_cache = ResponseCache(_create_backend())
@@ -8,6 +8,7 @@ An endpoint for [CocktailBerry](https://github.com/AndreWohnsland/CocktailBerry)
 ## cocktail
 
 You can **post your cocktaildata** or **get all the cocktaildata**.
+The **stats** routes return the aggregated data used in the dashboard, without the need to get all the data.
 Check the tags which route is public accessible and which one is protected by an API key.
 Usually routes inserting or changing data are protected, routes getting data are open.
 
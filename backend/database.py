@@ -0,0 +1,186 @@
+import logging
+from collections.abc import AsyncIterator
+from typing import Any
+
+from beanie import Document, init_beanie
+from environment import (
+    COCKTAIL_TIMESERIES,
+    CONNECTION_STRING,
+    DATABASE_NAME,
+    READ_CONNECTION_STRING,
+    READ_MAX_STALENESS,
+    READ_POOL_SIZE,
+    READ_PREFERENCE,
+    READ_TIMEOUT_MS,
+    WRITE_POOL_SIZE,
+    WRITE_TIMEOUT_MS,
+)
+from models import (
+    ApiKeyDocument,
+    CocktailDocument,
+    DailyRollupDocument,
+    HourlyRollupDocument,
+    InstallationDocument,
+    MaintenanceDocument,
+    ResponseCacheDocument,
+    SummaryDocument,
+)
+from pydantic import BaseModel
+from pymongo import ASCENDING, AsyncMongoClient, IndexModel
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import PyMongoError
+from pymongo.monitoring import ConnectionPoolListener
+
+_logger = logging.getLogger(__name__)
+
+DOCUMENT_MODELS: list[type[Document]] = [
+    CocktailDocument,
+    InstallationDocument,
+    ApiKeyDocument,
+    SummaryDocument,
+    MaintenanceDocument,
+    ResponseCacheDocument,
+    HourlyRollupDocument,
+    DailyRollupDocument,
+]
+
+# the rollups are updated by their time bucket and grouping keys
+_ROLLUP_KEY = IndexModel(
+    [("date", ASCENDING), ("machinename", ASCENDING), ("cocktailname", ASCENDING), ("countrycode", ASCENDING)],
+    unique=True,
+)
+
+INDEXES: dict[type[Document], list[IndexModel]] = {
+    CocktailDocument: [
+        IndexModel([("receivedate", ASCENDING)]),
+        IndexModel([("makedate", ASCENDING)]),
+        # the buckets of a time series collection are grouped by the machine and then by time
+        IndexModel([("machinename", ASCENDING), ("receivedate", ASCENDING)])
+        if COCKTAIL_TIMESERIES
+        else IndexModel([("machinename", ASCENDING)]),
+        IndexModel([("cocktailname", ASCENDING)]),
+    ],
+    InstallationDocument: [
+        IndexModel([("receivedate", ASCENDING)]),
+    ],
+    ApiKeyDocument: [
+        IndexModel([("api_key", ASCENDING)], unique=True),
+    ],
+    ResponseCacheDocument: [
+        IndexModel([("namespace", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    HourlyRollupDocument: [_ROLLUP_KEY],
+    DailyRollupDocument: [_ROLLUP_KEY],
+}
+
+
+# documents fetched and encoded at once by the bulk reads
+READ_BATCH_SIZE = 10_000
+
+_read_database: AsyncDatabase | None = None
+
+
+def create_clients(
+    write_listener: ConnectionPoolListener, read_listener: ConnectionPoolListener
+) -> tuple[AsyncMongoClient, AsyncMongoClient]:
+    """Create the client for the writes (always on the primary) and the one for the public reads.
+
+    Each one got its own pool, the read client may use secondaries, so reads may lag behind the writes.
+    """
+    write_client: AsyncMongoClient = AsyncMongoClient(
+        CONNECTION_STRING,
+        event_listeners=[write_listener],
+        **_client_options(WRITE_POOL_SIZE, WRITE_TIMEOUT_MS),
+    )
+    read_options = _client_options(READ_POOL_SIZE, READ_TIMEOUT_MS)
+    read_options["readPreference"] = READ_PREFERENCE
+    if READ_MAX_STALENESS is not None:
+        read_options["maxStalenessSeconds"] = READ_MAX_STALENESS
+    read_client: AsyncMongoClient = AsyncMongoClient(
+        READ_CONNECTION_STRING, event_listeners=[read_listener], **read_options
+    )
+    return write_client, read_client
+
+
+def _client_options(pool_size: int | None, timeout_ms: int | None) -> dict[str, Any]:
+    options: dict[str, Any] = {}
+    if pool_size is not None:
+        options["maxPoolSize"] = pool_size
+    if timeout_ms is not None:
+        options["timeoutMS"] = timeout_ms
+    return options
+
+
+def get_database(mongodb_client: AsyncMongoClient) -> AsyncDatabase:
+    return mongodb_client.get_database(DATABASE_NAME)
+
+
+async def init_database(mongodb_client: AsyncMongoClient, read_client: AsyncMongoClient | None = None) -> AsyncDatabase:
+    """Initialize beanie and the database for the public reads and check the connection to the database.
+
+    Without a read client, the public reads use the given client as well.
+    """
+    global _read_database  # noqa: PLW0603
+    database = get_database(mongodb_client)
+    await init_beanie(database, document_models=DOCUMENT_MODELS)
+    _read_database = get_database(read_client or mongodb_client)
+    ping_response = await database.command("ping")
+    if int(ping_response["ok"]) != 1:
+        raise Exception("Problem connecting to database cluster.")
+    _logger.info("Connected to database cluster.")
+    return database
+
+
+async def ensure_indexes() -> None:
+    """Create the indexes used by the queries, existing indexes are left untouched.
+
+    A failing collection is logged, so the indexes of the others are still created.
+    """
+    for model, indexes in INDEXES.items():
+        try:
+            created = await model.get_pymongo_collection().create_indexes(indexes)
+        except PyMongoError:
+            _logger.exception("Could not ensure the indexes on %s", model.get_collection_name())
+            continue
+        _logger.info("Ensured indexes on %s: %s", model.get_collection_name(), ", ".join(created))
+
+
+async def is_timeseries(model: type[Document]) -> bool:
+    """Check if the collection of the model exists as time series collection."""
+    collection = model.get_pymongo_collection()
+    cursor = await collection.database.list_collections(filter={"name": collection.name})
+    return any(info["type"] == "timeseries" for info in await cursor.to_list())
+
+
+async def check_cocktail_layout() -> None:
+    """Make sure the cocktails are stored like configured, the queries of the time series layout need migrated ids."""
+    if COCKTAIL_TIMESERIES and not await is_timeseries(CocktailDocument):
+        raise RuntimeError("Cocktails are not stored as time series yet, run `migrations.py --timeseries` first")
+
+
+def read_collection(model: type[Document]) -> AsyncCollection:
+    """Get the collection of the model for the public reads, which may be served by secondaries."""
+    if _read_database is None:
+        raise RuntimeError("Database is not initialized")
+    return _read_database.get_collection(model.get_collection_name())
+
+
+async def read_aggregate[T: BaseModel](model: type[Document], pipeline: list[dict], projection: type[T]) -> list[T]:
+    """Run the aggregation on the read collection of the model."""
+    cursor = await read_collection(model).aggregate(pipeline)
+    return [projection.model_validate(entry) async for entry in cursor]
+
+
+async def read_rows(
+    model: type[Document], query: dict[str, Any], fields: dict[str, Any] | None = None, order: str = "_id"
+) -> AsyncIterator[list[dict[str, Any]]]:
+    """Get the raw documents of the read collection of the model sorted by the order field, batch wise.
+
+    By default they are in insertion order, the order field needs an index, otherwise all documents are sorted first.
+    They are not validated by the model, so bulk reads, which only encode them again, save the validation.
+    """
+    cursor = read_collection(model).find(query, fields).sort(order).batch_size(READ_BATCH_SIZE)
+    while batch := await cursor.to_list(READ_BATCH_SIZE):
+        yield batch
@@ -3,5 +3,36 @@ import os
 from dotenv import load_dotenv
 
 load_dotenv()
+
+
+def _optional_int(name: str) -> int | None:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
 is_dev = os.getenv("DEBUG") is not None
 CONNECTION_STRING = os.environ["ATLAS_URI"]
+DATABASE_NAME = os.getenv("DATABASE_NAME", "cocktailberry" + ("_dev" if is_dev else ""))
+# the public reads (dashboard) can use other nodes than the writes, by default they use the same
+READ_CONNECTION_STRING = os.getenv("READ_URI", CONNECTION_STRING)
+READ_PREFERENCE = os.getenv("READ_PREFERENCE", "primary")
+# maximum replication lag of a secondary used for reads, at least 90 seconds, only for non primary read preferences
+READ_MAX_STALENESS = _optional_int("READ_MAX_STALENESS")
+# pool size and timeout (in ms, for each operation) of the clients, unset uses the pymongo defaults
+WRITE_POOL_SIZE = _optional_int("WRITE_POOL_SIZE")
+WRITE_TIMEOUT_MS = _optional_int("WRITE_TIMEOUT_MS")
+READ_POOL_SIZE = _optional_int("READ_POOL_SIZE")
+READ_TIMEOUT_MS = _optional_int("READ_TIMEOUT_MS")
+# store the cocktails in a time series collection, existing data needs to be migrated first (see migrations.py)
+COCKTAIL_TIMESERIES = os.getenv("COCKTAIL_TIMESERIES", "").lower() in {"1", "true"}
+# buffer single cocktail inserts and write them in bulk, 0 disables the buffer
+INGEST_BUFFER_SIZE = int(os.getenv("INGEST_BUFFER_SIZE", "0"))
+INGEST_FLUSH_INTERVAL = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", "200")) / 1000
+INGEST_FLUSH_SIZE = int(os.getenv("INGEST_FLUSH_SIZE", "500"))
+# quota of each api key, tokens (cocktails) are refilled per second up to the burst size
+INGEST_QUOTA_RATE = float(os.getenv("INGEST_QUOTA_RATE", "1"))
+INGEST_QUOTA_BURST = int(os.getenv("INGEST_QUOTA_BURST", "1000"))
+# cache of the public data responses, "memory" (per worker) or "mongo" (shared by all workers)
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE_MB", "64")) * 1024 * 1024
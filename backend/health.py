@@ -0,0 +1,181 @@
+import asyncio
+import contextlib
+import logging
+import math
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from core.metadata import Tags
+from fastapi import APIRouter, Response, status
+from ingest import ingest_buffer
+from pymongo import AsyncMongoClient
+from pymongo.errors import PyMongoError
+from pymongo.monitoring import (
+    ConnectionCheckedInEvent,
+    ConnectionCheckedOutEvent,
+    ConnectionCheckOutFailedEvent,
+    ConnectionCheckOutStartedEvent,
+    ConnectionClosedEvent,
+    ConnectionCreatedEvent,
+    ConnectionPoolListener,
+    ConnectionReadyEvent,
+    PoolClearedEvent,
+    PoolClosedEvent,
+    PoolCreatedEvent,
+    PoolReadyEvent,
+)
+from schemas import LiveStatus, PoolStats, ReadyStatus, StartupTimes
+
+_logger = logging.getLogger(__name__)
+
+PING_INTERVAL = 10
+# the app is not ready if the database did not answer for this long
+PING_MAX_AGE = 3 * PING_INTERVAL
+
+
+class PoolStatsListener(ConnectionPoolListener):
+    """Counts the connections of the pools of all servers, pymongo does not offer this itself."""
+
+    def __init__(self) -> None:
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.failed_checkouts = 0
+
+    def pool_created(self, event: PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: PoolClearedEvent) -> None:
+        pass
+
+    def pool_closed(self, event: PoolClosedEvent) -> None:
+        pass
+
+    def connection_created(self, event: ConnectionCreatedEvent) -> None:
+        self.open += 1
+
+    def connection_ready(self, event: ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: ConnectionClosedEvent) -> None:
+        self.open -= 1
+
+    def connection_check_out_started(self, event: ConnectionCheckOutStartedEvent) -> None:
+        self.waiting += 1
+
+    def connection_check_out_failed(self, event: ConnectionCheckOutFailedEvent) -> None:
+        self.waiting -= 1
+        self.failed_checkouts += 1
+
+    def connection_checked_out(self, event: ConnectionCheckedOutEvent) -> None:
+        self.waiting -= 1
+        self.in_use += 1
+
+    def connection_checked_in(self, event: ConnectionCheckedInEvent) -> None:
+        self.in_use -= 1
+
+
+class HealthMonitor:
+    """Pings the database with every client in the background, so the probes can answer without waiting for it."""
+
+    def __init__(self, pool_stats: dict[str, PoolStatsListener]) -> None:
+        self.pool_stats = pool_stats
+        self.startup = StartupTimes()
+        self.last_ping: dict[str, datetime | None] = dict.fromkeys(pool_stats)
+        self._last_ping_time: dict[str, float] = {}
+        self._clients: dict[str, AsyncMongoClient] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self, clients: dict[str, AsyncMongoClient]) -> None:
+        self._clients = clients
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    @property
+    def ready(self) -> bool:
+        now = time.monotonic()
+        return all(now - self._last_ping_time.get(role, -math.inf) < PING_MAX_AGE for role in self.pool_stats)
+
+    def pools(self) -> dict[str, PoolStats]:
+        return {role: self._pool(role, listener) for role, listener in self.pool_stats.items()}
+
+    def _pool(self, role: str, listener: PoolStatsListener) -> PoolStats:
+        client = self._clients.get(role)
+        max_size = client.options.pool_options.max_pool_size if client is not None else 0
+        return PoolStats(
+            max_size=int(max_size) if math.isfinite(max_size) else None,
+            open=listener.open,
+            in_use=listener.in_use,
+            waiting=listener.waiting,
+            failed_checkouts=listener.failed_checkouts,
+        )
+
+    async def _run(self) -> None:
+        while True:
+            for role, client in self._clients.items():
+                await self.ping(role, client)
+            await asyncio.sleep(PING_INTERVAL)
+
+    async def ping(self, role: str, client: AsyncMongoClient) -> None:
+        try:
+            await client.admin.command("ping")
+        except PyMongoError as err:
+            _logger.warning("Database ping of the %s client failed: %s", role, err)
+            return
+        self.last_ping[role] = datetime.now()
+        self._last_ping_time[role] = time.monotonic()
+
+
+def process_uptime() -> float | None:
+    """Get the seconds since the process started, None if the os does not provide it."""
+    try:
+        stat = Path("/proc/self/stat").read_text()
+        # the fields after the process name (in brackets), start time is the 22nd field, in clock ticks since boot
+        start_ticks = int(stat.rsplit(")", 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, AttributeError, ValueError):
+        return None
+
+
+WRITE_CLIENT = "write"
+READ_CLIENT = "read"
+pool_stats = {WRITE_CLIENT: PoolStatsListener(), READ_CLIENT: PoolStatsListener()}
+health_monitor = HealthMonitor(pool_stats)
+health_router = APIRouter(prefix="/health", tags=[Tags.PUBLIC])
+
+
+@health_router.get("/live")
+async def get_liveness() -> LiveStatus:
+    """Check if the app is running, does not depend on the database."""
+    return LiveStatus(alive=True)
+
+
+@health_router.get("/ready", responses={503: {"model": ReadyStatus}})
+async def get_readiness(response: Response) -> ReadyStatus:
+    """Check if the app can serve requests, this is the case if the last database pings were successful recently.
+
+    If the ingest buffer is enabled, it also needs to be running, else the inserted cocktails would not be written.
+    Also reports the connection pools of the write and read client and how long the startup took.
+    """
+    ready = health_monitor.ready and ingest_buffer.healthy
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return ReadyStatus(
+        ready=ready,
+        ingest_buffer=ingest_buffer.healthy,
+        last_ping=health_monitor.last_ping,
+        pools=health_monitor.pools(),
+        startup=health_monitor.startup,
+    )
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+from datetime import UTC, datetime, timedelta
+
+import rollups
+import summary
+from beanie import PydanticObjectId
+from cache import COCKTAILS_CACHE, response_cache
+from environment import (
+    COCKTAIL_TIMESERIES,
+    INGEST_BUFFER_SIZE,
+    INGEST_FLUSH_INTERVAL,
+    INGEST_FLUSH_SIZE,
+    WRITE_TIMEOUT_MS,
+)
+from models import CocktailDocument
+from pymongo.errors import BulkWriteError, PyMongoError
+
+_logger = logging.getLogger(__name__)
+
+_DUPLICATE_KEY_ERROR = 11000
+_WRITE_ATTEMPTS = 3
+# pymongo waits up to 30 seconds for a server by default
+_WRITE_TIMEOUT = timedelta(seconds=(WRITE_TIMEOUT_MS or 30_000) / 1000)
+# a cocktail is written at most this long after its id was created, a write is not started later than that,
+# so readers know when no more cocktails with older ids appear
+MAX_WRITE_DELAY = timedelta(seconds=INGEST_FLUSH_INTERVAL) + _WRITE_ATTEMPTS * (
+    timedelta(seconds=INGEST_FLUSH_INTERVAL) + _WRITE_TIMEOUT
+)
+
+
+class IngestBufferFullError(Exception):
+    """Raised if the buffer can not take any more cocktails."""
+
+
+class IngestBuffer:
+    """Collects the cocktails and writes them in bulk in the background.
+
+    A bulk write is done every flush interval or as soon as there are flush size cocktails.
+    A failed write may still have been applied by the server, so the cocktails of a retry may already exist.
+    The unique id index rejects them as duplicates, but time series collections do not have one,
+    so there the already written cocktails are looked up and skipped before writing them again.
+    Cocktails which could not be written within the maximum write delay are logged and not tried again.
+    """
+
+    def __init__(self, max_size: int, flush_interval: float, flush_size: int) -> None:
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._queue: asyncio.Queue[CocktailDocument] = asyncio.Queue(maxsize=max_size)
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        # ids of the requeued cocktails, their former write may have been applied anyway
+        self._unconfirmed: set[PydanticObjectId] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @property
+    def healthy(self) -> bool:
+        """Check if the cocktails are still written, always true if the buffer is disabled."""
+        return not self.enabled or (self._task is not None and not self._task.done())
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(_log_crash)
+
+    async def stop(self) -> None:
+        """Stop taking cocktails and write all the remaining ones."""
+        if self._task is None:
+            return
+        self._stopping = True
+        # wait does not raise, the error of a crashed task is already logged
+        await asyncio.wait([self._task])
+        self._task = None
+        if not self._queue.empty():
+            await self._run()
+
+    def put(self, document: CocktailDocument) -> None:
+        if self._stopping:
+            raise IngestBufferFullError("Buffer is shutting down")
+        try:
+            self._queue.put_nowait(document)
+        except asyncio.QueueFull as err:
+            raise IngestBufferFullError("Buffer is full") from err
+
+    async def _run(self) -> None:
+        while not (self._stopping and self._queue.empty()):
+            batch = await self._collect()
+            if not batch:
+                continue
+            # a failing batch must not stop the buffer, the next ones are written as usual
+            try:
+                written = await self._write(batch)
+            except Exception:
+                _logger.exception("Could not write %s buffered cocktails: %s", len(batch), _dump(batch))
+                continue
+            if written:
+                await track_inserted(written)
+
+    async def _collect(self) -> list[CocktailDocument]:
+        """Collect cocktails until the flush interval is over or the batch is full."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        batch: list[CocktailDocument] = []
+        while len(batch) < self.flush_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except TimeoutError:
+                break
+        return batch
+
+    async def _write(self, batch: list[CocktailDocument]) -> list[CocktailDocument]:
+        """Write the batch, returns the written cocktails, the ones which failed are logged or put back."""
+        written: list[CocktailDocument] = []
+        for attempt in range(1, _WRITE_ATTEMPTS + 1):
+            batch = self._drop_expired(batch)
+            if not batch:
+                return written
+            try:
+                if COCKTAIL_TIMESERIES and (attempt > 1 or any(d.id in self._unconfirmed for d in batch)):
+                    existing = await _find_existing(batch)
+                    written += [document for document in batch if document.id in existing]
+                    batch = [document for document in batch if document.id not in existing]
+                    self._unconfirmed.difference_update(existing)
+                    if not batch:
+                        return written
+                await CocktailDocument.insert_many(batch, ordered=False)
+                self._confirm(batch)
+                return written + batch
+            except BulkWriteError as err:
+                # duplicates are already written by a former attempt, others (like validation) will fail again
+                failed = {e["index"]: e for e in err.details["writeErrors"] if e["code"] != _DUPLICATE_KEY_ERROR}
+                for index, error in failed.items():
+                    _logger.error("Could not write cocktail %s: %s", _dump([batch[index]]), error["errmsg"])
+                self._confirm(batch)
+                return written + [document for index, document in enumerate(batch) if index not in failed]
+            except PyMongoError:
+                if attempt == _WRITE_ATTEMPTS:
+                    break
+                _logger.warning("Writing %s buffered cocktails failed, retrying", len(batch))
+                await asyncio.sleep(attempt * self.flush_interval)
+        self._requeue(batch)
+        return written
+
+    def _drop_expired(self, batch: list[CocktailDocument]) -> list[CocktailDocument]:
+        """Remove the cocktails which could not be written in time anymore, they are logged to restore them."""
+        oldest = datetime.now(UTC) - (MAX_WRITE_DELAY - _WRITE_TIMEOUT)
+        in_time: list[CocktailDocument] = []
+        expired: list[CocktailDocument] = []
+        for document in batch:
+            fits = document.id is not None and document.id.generation_time >= oldest
+            (in_time if fits else expired).append(document)
+        if expired:
+            _logger.error("Lost %s buffered cocktails, not written in time: %s", len(expired), _dump(expired))
+            self._confirm(expired)
+        return in_time
+
+    def _confirm(self, batch: list[CocktailDocument]) -> None:
+        if self._unconfirmed:
+            self._unconfirmed.difference_update(document.id for document in batch)
+
+    def _requeue(self, batch: list[CocktailDocument]) -> None:
+        """Put the cocktails back to write them with the next batch, the ones which do not fit anymore are logged."""
+        lost = []
+        for document in batch:
+            if self._stopping or self._queue.full():
+                lost.append(document)
+            else:
+                self._queue.put_nowait(document)
+                if document.id is not None:
+                    self._unconfirmed.add(document.id)
+        _logger.error(
+            "Could not write %s buffered cocktails, %s are tried again later", len(batch), len(batch) - len(lost)
+        )
+        if lost:
+            _logger.error("Lost %s buffered cocktails: %s", len(lost), _dump(lost))
+
+
+async def track_inserted(cocktails: list[CocktailDocument]) -> None:
+    """Update the summary, the rollups and the response cache for the inserted cocktails, all at the same time.
+
+    The cocktails are already written, so the errors are only logged, a failed request would make the machines
+    send them again.
+    """
+    results = await asyncio.gather(
+        summary.add_cocktails(cocktails),
+        rollups.add_cocktails(cocktails),
+        response_cache.invalidate(COCKTAILS_CACHE),
+        return_exceptions=True,
+    )
+    for name, result in zip(("summary", "rollups", "cache"), results, strict=True):
+        if isinstance(result, Exception):
+            _logger.error("Could not update the %s for %s cocktails", name, len(cocktails), exc_info=result)
+
+
+async def _find_existing(batch: list[CocktailDocument]) -> set[PydanticObjectId]:
+    """Get the ids of the cocktails of the batch which are already written.
+
+    The receive dates bound the query, as time series collections got no index on the id.
+    """
+    dates = [document.receivedate for document in batch]
+    query = {
+        "_id": {"$in": [document.id for document in batch]},
+        "receivedate": {"$gte": min(dates), "$lte": max(dates)},
+    }
+    cursor = CocktailDocument.get_pymongo_collection().find(query, {"_id": 1})
+    return {entry["_id"] async for entry in cursor}
+
+
+def _dump(documents: list[CocktailDocument]) -> str:
+    """Serialize the cocktails, so the lost ones can be restored from the log."""
+    return "[" + ",".join(document.model_dump_json() for document in documents) + "]"
+
+
+def _log_crash(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        _logger.error("Ingest buffer stopped, no cocktails are written anymore", exc_info=task.exception())
+
+
+ingest_buffer = IngestBuffer(INGEST_BUFFER_SIZE, INGEST_FLUSH_INTERVAL, INGEST_FLUSH_SIZE)
@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import rollups
+import summary
+from models import CocktailDocument, MaintenanceDocument
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from utils import TEST_COCKTAIL_PATTERN, utc_now
+
+_logger = logging.getLogger(__name__)
+
+# how often the scheduler checks for due jobs
+SCHEDULER_TICK = 60
+# a job is considered dead if it holds the lock longer, so another worker can take over
+LOCK_LEASE = timedelta(minutes=10)
+# cocktails may be written a bit after their receivedate (ingest buffer), so the last window is checked again
+CLEANUP_OVERLAP = timedelta(minutes=5)
+
+# every process gets its own id, so only the holder releases the lock
+_OWNER = uuid.uuid4().hex
+
+
+@dataclass(frozen=True)
+class MaintenanceJob:
+    """Job which runs every interval, only in one process at a time.
+
+    The job gets the start of its last successful run (None if it never ran) and returns the affected rows.
+    """
+
+    name: str
+    interval: timedelta
+    run: Callable[[datetime | None], Awaitable[int]]
+
+
+class MaintenanceScheduler:
+    """Runs the due maintenance jobs in the background.
+
+    All workers run the scheduler, the lock document of the job in the database makes sure only one runs the job.
+    The last run, duration and affected rows are stored there as well.
+    """
+
+    def __init__(self, jobs: list[MaintenanceJob], tick: float = SCHEDULER_TICK) -> None:
+        self.jobs = jobs
+        self.tick = tick
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            for job in self.jobs:
+                try:
+                    await self.run_job(job)
+                except PyMongoError:
+                    _logger.exception("Could not run maintenance job %s", job.name)
+            await asyncio.sleep(self.tick)
+
+    async def run_job(self, job: MaintenanceJob) -> None:
+        """Run the job if it is due and no other process runs it."""
+        started = utc_now()
+        acquired, last_run = await _acquire(job, started)
+        if not acquired:
+            return
+        start_time = time.perf_counter()
+        try:
+            affected = await job.run(last_run)
+        except Exception:
+            _logger.exception("Maintenance job %s failed", job.name)
+            await _release(job, None)
+            return
+        duration = time.perf_counter() - start_time
+        _logger.info("Maintenance job %s affected %s rows in %.3f s", job.name, affected, duration)
+        await _release(job, {"last_run": started, "last_duration": duration, "last_affected": affected})
+
+
+async def _acquire(job: MaintenanceJob, now: datetime) -> tuple[bool, datetime | None]:
+    """Lock the job if it is due and not locked, returns if it got locked and the last run."""
+    collection = MaintenanceDocument.get_pymongo_collection()
+    # $not $gt also matches missing values, so the document is created on the first run
+    due_and_unlocked = {
+        "_id": job.name,
+        "locked_until": {"$not": {"$gt": now}},
+        "last_run": {"$not": {"$gt": now - job.interval}},
+    }
+    try:
+        before = await collection.find_one_and_update(
+            due_and_unlocked,
+            {"$set": {"locked_until": now + LOCK_LEASE, "owner": _OWNER}},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+    except DuplicateKeyError:
+        # the job exists but is not due or is locked by another process
+        return False, None
+    return True, before.get("last_run") if before is not None else None
+
+
+async def _release(job: MaintenanceJob, result: dict | None) -> None:
+    update = {"locked_until": None, **(result or {})}
+    await MaintenanceDocument.get_pymongo_collection().update_one({"_id": job.name, "owner": _OWNER}, {"$set": update})
+
+
+async def delete_test_cocktails(last_run: datetime | None) -> int:
+    """Delete the cocktails sent while testing CocktailBerry.
+
+    Only the cocktails received since the last run are checked, so the regex does not scan the whole collection.
+    """
+    query: dict = {"cocktailname": TEST_COCKTAIL_PATTERN}
+    if last_run is not None:
+        query["receivedate"] = {"$gte": last_run - CLEANUP_OVERLAP}
+    result = await CocktailDocument.get_pymongo_collection().delete_many(query)
+    if result.deleted_count > 0:
+        await summary.remove_cocktails()
+    return result.deleted_count
+
+
+async def build_summary(last_run: datetime | None) -> int:
+    """Build the summary from the existing data if it was not built yet, which reads all cocktails."""
+    return await summary.ensure_summary()
+
+
+# run once on startup, it is always due, the lock keeps the other workers from building it at the same time
+BUILD_SUMMARY_JOB = MaintenanceJob("build_summary", timedelta(0), build_summary)
+
+JOBS = [
+    MaintenanceJob("delete_test_cocktails", timedelta(minutes=20), delete_test_cocktails),
+    MaintenanceJob("compact_rollups", timedelta(hours=6), rollups.compact_rollups),
+]
+
+maintenance_scheduler = MaintenanceScheduler(JOBS)
@@ -0,0 +1,138 @@
+"""Migrations of existing data, run with `uv run python migrations.py` in the backend folder."""
+
+import argparse
+import asyncio
+import logging
+from datetime import UTC, datetime
+from typing import Any
+
+import rollups
+import summary
+from beanie import Document, PydanticObjectId
+from database import init_database, is_timeseries
+from environment import CONNECTION_STRING
+from models import COCKTAIL_TIMESERIES_CONFIG, CocktailDocument, InstallationDocument
+from pymongo import AsyncMongoClient, UpdateOne
+from schemas import DATEFORMAT_STR
+from utils import setup_logging
+
+_logger = logging.getLogger(__name__)
+
+# the cocktails are moved from the existing collection, which gets renamed, into the new time series collection
+LEGACY_COCKTAILS = "cocktails_legacy"
+
+# dates used to be stored as formatted strings, the fields which need to be converted to datetime
+_DATE_FIELDS: dict[type[Document], tuple[str, ...]] = {
+    CocktailDocument: ("makedate", "receivedate"),
+    InstallationDocument: ("receivedate",),
+}
+
+
+def _convert_date(document: dict[str, Any], field: str) -> datetime | None:
+    """Parse the date string, if this is not possible the receivedate falls back to the insert time of the id."""
+    try:
+        return datetime.strptime(document[field], DATEFORMAT_STR)
+    except ValueError:
+        _logger.warning("Could not parse %s=%r of %s", field, document[field], document["_id"])
+    if field == "receivedate":
+        return document["_id"].generation_time.replace(tzinfo=None)
+    return None
+
+
+async def migrate_dates(batch_size: int = 500, pause: float = 0.5) -> None:
+    """Convert the date strings of existing documents into native dates.
+
+    Documents are converted in batches with a pause in between, to not put too much load on the database.
+    Only documents still containing strings are selected, so the migration can be stopped and resumed anytime.
+    """
+    for model, fields in _DATE_FIELDS.items():
+        collection = model.get_pymongo_collection()
+        string_dates: dict[str, Any] = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        last_id = None
+        converted = 0
+        while True:
+            query = string_dates if last_id is None else {"$and": [string_dates, {"_id": {"$gt": last_id}}]}
+            batch = await collection.find(query, dict.fromkeys(fields, 1)).sort("_id").limit(batch_size).to_list()
+            if not batch:
+                break
+            updates = [
+                UpdateOne(
+                    {"_id": document["_id"]},
+                    {"$set": {f: _convert_date(document, f) for f in fields if isinstance(document.get(f), str)}},
+                )
+                for document in batch
+            ]
+            await collection.bulk_write(updates, ordered=False)
+            last_id = batch[-1]["_id"]
+            converted += len(batch)
+            _logger.info("Converted dates of %s documents in %s", converted, model.get_collection_name())
+            await asyncio.sleep(pause)
+
+
+def _timeseries_id(document: dict[str, Any]) -> PydanticObjectId:
+    """Get the id with the receivedate as creation time, the other bytes of the old id are kept to stay unique.
+
+    Time series collections got no id index, so the cocktail route also limits the receivedate by the ids.
+    """
+    timestamp = int(document["receivedate"].replace(tzinfo=UTC).timestamp())
+    return PydanticObjectId(timestamp.to_bytes(4, "big") + document["_id"].binary[4:])
+
+
+async def migrate_timeseries(batch_size: int = 500, pause: float = 0.5) -> None:
+    """Move the cocktails into a time series collection, the dates need to be converted already.
+
+    The existing collection is renamed and the cocktails are moved from there in batches.
+    The first batch is removed from the new collection before it is inserted, so an interrupted migration can be
+    resumed without duplicates (time series collections got no unique ids).
+    The ids get changed, so the data version is changed as well, clients should load all data again.
+    """
+    collection = CocktailDocument.get_pymongo_collection()
+    database = collection.database
+    if not await is_timeseries(CocktailDocument):
+        if await database.list_collection_names(filter={"name": collection.name}):
+            await collection.rename(LEGACY_COCKTAILS)
+        await database.create_collection(**COCKTAIL_TIMESERIES_CONFIG.build_query(collection.name))
+    legacy = database.get_collection(LEGACY_COCKTAILS)
+    moved = 0
+    while batch := await legacy.find().sort("_id").limit(batch_size).to_list():
+        documents = [document | {"_id": _timeseries_id(document)} for document in batch]
+        if moved == 0:
+            await collection.delete_many({"_id": {"$in": [document["_id"] for document in documents]}})
+        await collection.insert_many(documents)
+        await legacy.delete_many({"_id": {"$in": [document["_id"] for document in batch]}})
+        moved += len(batch)
+        _logger.info("Moved %s cocktails into the time series collection", moved)
+        await asyncio.sleep(pause)
+    await legacy.drop()
+    if moved > 0:
+        await summary.remove_cocktails()
+
+
+async def _run_migration(batch_size: int, pause: float, timeseries: bool, rebuild_rollups: bool) -> None:
+    mongodb_client: AsyncMongoClient = AsyncMongoClient(CONNECTION_STRING)
+    try:
+        await init_database(mongodb_client)
+        await migrate_dates(batch_size, pause)
+        # the summary may be built while the dates were strings, which were not included in the first and last date
+        await summary.rebuild_summary()
+        if timeseries:
+            await migrate_timeseries(batch_size, pause)
+        if rebuild_rollups:
+            await rollups.rebuild_rollups()
+    finally:
+        await mongodb_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert the stored date strings into native dates, optionally move the cocktails to a time series."
+    )
+    parser.add_argument("--batch-size", type=int, default=500, help="Number of documents converted at once.")
+    parser.add_argument("--pause", type=float, default=0.5, help="Seconds to wait between the batches.")
+    parser.add_argument(
+        "--timeseries", action="store_true", help="Move the cocktails into a time series collection afterwards."
+    )
+    parser.add_argument("--rollups", action="store_true", help="Build the rollups from all cocktails afterwards.")
+    args = parser.parse_args()
+    setup_logging()
+    asyncio.run(_run_migration(args.batch_size, args.pause, args.timeseries, args.rollups))
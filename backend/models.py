@@ -1,4 +1,14 @@
-from beanie import Document
+from datetime import datetime
+
+from beanie import Document, Granularity, PydanticObjectId, TimeSeriesConfig
+from environment import COCKTAIL_TIMESERIES
+from pydantic import Field
+from schemas import LegacyDatetime
+
+# cocktails are an append only stream of events, each machine is a series (it always uses the same key and language)
+COCKTAIL_TIMESERIES_CONFIG = TimeSeriesConfig(
+    time_field="receivedate", meta_field="machinename", granularity=Granularity.hours
+)
 
 
 class CocktailDocument(Document):
@@ -7,16 +17,17 @@ class CocktailDocument(Document):
     machinename: str
     countrycode: str
     keyname: str | None
-    makedate: str | None
-    receivedate: str
+    makedate: LegacyDatetime | None
+    receivedate: LegacyDatetime
 
     class Settings:  # noqa: D106
         name = "cocktails"
+        timeseries = COCKTAIL_TIMESERIES_CONFIG if COCKTAIL_TIMESERIES else None
 
 
 class InstallationDocument(Document):
     os: str
-    receivedate: str
+    receivedate: LegacyDatetime
 
     class Settings:  # noqa: D106
         name = "installations"
@@ -29,3 +40,75 @@ class ApiKeyDocument(Document):
 
     class Settings:  # noqa: D106
         name = "api_keys"
+
+
+class SummaryDocument(Document):
+    id: str = "summary"  # type: ignore[assignment]
+    cocktails: int = 0
+    volume: int = 0
+    first_date: datetime | None = None
+    last_date: datetime | None = None
+    machines: list[str] = Field(default_factory=list)
+    recipes: list[str] = Field(default_factory=list)
+    languages: list[str] = Field(default_factory=list)
+    installations: int = 0
+    # changed with every write, so clients can tell if the data changed
+    cocktails_version: int = 0
+    installations_version: int = 0
+    # writes before the summary was built from the existing data create it with only their own numbers
+    built: bool = False
+
+    class Settings:  # noqa: D106
+        name = "summary"
+
+
+class MaintenanceDocument(Document):
+    """Lock and metrics of a maintenance job, the id is the job name."""
+
+    id: str  # type: ignore[assignment]
+    owner: str | None = None
+    locked_until: datetime | None = None
+    last_run: datetime | None = None
+    last_duration: float | None = None
+    last_affected: int | None = None
+
+    class Settings:  # noqa: D106
+        name = "maintenance"
+
+
+class ResponseCacheDocument(Document):
+    """Cached response of a public route, shared by all workers."""
+
+    id: str  # type: ignore[assignment]
+    namespace: str
+    body: bytes
+    media_type: str
+    headers: dict[str, str]
+    expires_at: datetime
+
+    class Settings:  # noqa: D106
+        name = "response_cache"
+
+
+class HourlyRollupDocument(Document):
+    """Number and volume of the cocktails made in the hour (None: no made date) by machine, recipe and language."""
+
+    date: datetime | None
+    machinename: str
+    cocktailname: str
+    countrycode: str
+    cocktails: int = 0
+    volume: int = 0
+
+    class Settings:  # noqa: D106
+        name = "rollups_hourly"
+
+
+class DailyRollupDocument(HourlyRollupDocument):
+    """Rollup of the whole day, older hourly rollups are compacted into these."""
+
+    # the compacted hourly rollups, so an interrupted compaction does not add them again
+    merged: list[PydanticObjectId] = Field(default_factory=list)
+
+    class Settings:  # noqa: D106
+        name = "rollups_daily"
@@ -1,4 +1,84 @@
+import math
+import time
+from collections import OrderedDict
+
+from environment import INGEST_QUOTA_BURST, INGEST_QUOTA_RATE
+from fastapi import HTTPException, Response, status
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
 limiter = Limiter(key_func=get_remote_address)
+
+RATE_LIMIT_HEADER = "X-RateLimit-Limit"
+RATE_LIMIT_REMAINING_HEADER = "X-RateLimit-Remaining"
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        self.tokens = tokens
+        self.updated = updated
+
+
+class TokenBucketLimiter:
+    """Token bucket per key, each request takes as many tokens as it costs.
+
+    The buckets are ordered by their last use, so idle ones are evicted from the front.
+    A bucket idle long enough to be full again is the same as a new one, so evicting it changes nothing.
+    A request costing more than the capacity is allowed with a full bucket and puts it into debt,
+    so large batches are charged in full but do not wait forever.
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets: OrderedDict[str, _Bucket] = OrderedDict()
+
+    def acquire(self, key: str, cost: int) -> tuple[bool, float, float]:
+        """Take the tokens if there are enough, returns if they were taken, the remaining tokens and the wait time.
+
+        The remaining tokens are negative while the bucket is in debt.
+        """
+        now = time.monotonic()
+        self._evict_idle(now)
+        bucket = self._buckets.pop(key, None) or _Bucket(self.capacity, now)
+        self._buckets[key] = bucket
+        bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        # more than the capacity can never be there, so a full bucket is enough
+        required = min(cost, self.capacity)
+        if bucket.tokens < required:
+            return False, bucket.tokens, (required - bucket.tokens) / self.rate
+        bucket.tokens -= cost
+        return True, bucket.tokens, 0.0
+
+    def _evict_idle(self, now: float) -> None:
+        while self._buckets:
+            bucket = next(iter(self._buckets.values()))
+            # a bucket in debt needs longer to be full again
+            if now - bucket.updated < (self.capacity - bucket.tokens) / self.rate:
+                return
+            self._buckets.popitem(last=False)
+
+
+ingest_limiter = TokenBucketLimiter(INGEST_QUOTA_RATE, INGEST_QUOTA_BURST)
+
+
+def check_ingest_quota(key: str, cost: int, response: Response) -> None:
+    """Take the cost from the quota of the key and set the quota headers.
+
+    Raises a 429 HTTPException with the time to wait if the quota is used up.
+    """
+    allowed, remaining, retry_after = ingest_limiter.acquire(key, cost)
+    headers = {
+        RATE_LIMIT_HEADER: str(ingest_limiter.capacity),
+        RATE_LIMIT_REMAINING_HEADER: str(max(0, math.floor(remaining))),
+    }
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many cocktails sent, please try again later",
+            headers={**headers, "Retry-After": str(math.ceil(retry_after))},
+        )
+    response.headers.update(headers)
@@ -0,0 +1,181 @@
+import contextlib
+import hashlib
+import io
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import Any
+
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from bson import ObjectId
+from fastapi import Request, Response, status
+from fastapi.responses import StreamingResponse
+from schemas import parse_legacy_date
+
+JSON_MEDIA_TYPE = "application/json"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+# the columnar formats are preferred, since they are the most compact ones
+_MEDIA_TYPE_PREFERENCE = (ARROW_MEDIA_TYPE, PARQUET_MEDIA_TYPE, NDJSON_MEDIA_TYPE)
+# the negotiated responses differ by the accept header, so caches need to keep them apart
+VARY_HEADERS = {"Vary": "Accept"}
+COLUMNAR_MEDIA_TYPES = (ARROW_MEDIA_TYPE, PARQUET_MEDIA_TYPE)
+# documentation of the additional media types for the openapi spec
+STREAM_RESPONSES: dict[int | str, dict[str, Any]] = {
+    200: {"content": {media_type: {} for media_type in _MEDIA_TYPE_PREFERENCE}}
+}
+
+Row = dict[str, Any]
+
+
+def negotiate_media_type(request: Request) -> str:
+    """Get the media type to use, depending on the accepted ones of the client, defaults to json.
+
+    The type with the highest quality is used, the more compact one if they are equal, `q=0` is not acceptable.
+    Wildcards like `*/*` only select json, so clients not asking for the other formats keep getting json.
+    """
+    qualities = _accepted_qualities(request.headers.get("accept", ""))
+    wildcard = max(qualities.get("*/*", 0.0), qualities.get("application/*", 0.0))
+    candidates = [(qualities.get(media_type, 0.0), media_type) for media_type in _MEDIA_TYPE_PREFERENCE]
+    candidates.append((qualities.get(JSON_MEDIA_TYPE, wildcard), JSON_MEDIA_TYPE))
+    # max keeps the first of equal qualities, which is the preferred one
+    quality, media_type = max(candidates, key=lambda candidate: candidate[0])
+    return media_type if quality > 0 else JSON_MEDIA_TYPE
+
+
+def _accepted_qualities(accept: str) -> dict[str, float]:
+    """Parse the media ranges of the accept header with their quality, which is 1 if not given."""
+    qualities: dict[str, float] = {}
+    for entry in accept.split(","):
+        media_range, *parameters = (part.strip() for part in entry.split(";"))
+        if not media_range:
+            continue
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                # an invalid quality is ignored
+                with contextlib.suppress(ValueError):
+                    quality = min(max(float(value), 0.0), 1.0)
+        qualities[media_range.lower()] = quality
+    return qualities
+
+
+def make_etag(request: Request, version: int, *params: object) -> str:
+    """Build the (weak) etag of the response, it changes with the data version, the parameters and the media type.
+
+    Only the parsed parameters of the route are used, so unknown or reordered query parameters get the same etag.
+    """
+    variant = "|".join([*map(str, params), negotiate_media_type(request)])
+    digest = hashlib.blake2b(variant.encode(), digest_size=8).hexdigest()
+    return f'W/"{version}-{digest}"'
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    """Get the 304 response if the client already got the data of the etag, else None."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+    # compression changes the bytes but not the data, so weak comparison is used
+    client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in client_etags or etag.removeprefix("W/") in client_etags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag) | VARY_HEADERS)
+    return None
+
+
+def cache_headers(etag: str) -> dict[str, str]:
+    """Headers so the client always revalidates the data with the etag."""
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def _encode_default(value: Any) -> str:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+async def _json_array(batches: AsyncIterable[list[Row]]) -> AsyncIterator[bytes]:
+    """Encode the rows as one json array, batch by batch."""
+    separator = b"["
+    async for batch in batches:
+        if not batch:
+            continue
+        # strip the brackets of the encoded batch, so the batches form one array
+        yield separator + orjson.dumps(batch, default=_encode_default)[1:-1]
+        separator = b","
+    # separator is only unchanged if there was not a single row
+    yield b"[]" if separator == b"[" else b"]"
+
+
+async def _ndjson(batches: AsyncIterable[list[Row]]) -> AsyncIterator[bytes]:
+    """Encode the rows as one json document per line."""
+    async for batch in batches:
+        yield b"".join(orjson.dumps(row, default=_encode_default, option=orjson.OPT_APPEND_NEWLINE) for row in batch)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Writable file which keeps the written bytes until they are taken, so they can be streamed."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore[override]
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _columnar(batches: AsyncIterable[list[Row]], schema: pa.Schema, parquet: bool) -> AsyncIterator[bytes]:
+    """Encode the rows batch wise as arrow stream (or parquet row groups), fields not in the schema are dropped."""
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if parquet else pa.ipc.new_stream(sink, schema)
+    async for batch in batches:
+        writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+async def parse_legacy_dates(batches: AsyncIterable[list[Row]], fields: tuple[str, ...]) -> AsyncIterator[list[Row]]:
+    """Parse the not yet migrated date strings of the rows, like the models of the routes would do."""
+    async for batch in batches:
+        for row in batch:
+            for field in fields:
+                if isinstance(row.get(field), str):
+                    row[field] = parse_legacy_date(row[field])
+        yield batch
+
+
+def stream_rows(
+    request: Request,
+    batches: AsyncIterable[list[Row]],
+    arrow_schema: pa.Schema,
+    headers: dict[str, str] | None = None,
+) -> StreamingResponse:
+    """Stream the raw documents batch wise as they come from the cursor, in the format the client accepts.
+
+    Supported are json, ndjson as well as arrow stream and parquet, using the given schema.
+    This way, the backend never holds the whole collection in memory.
+    The documents are not validated by a model, the query needs to project them to the fields of the response model.
+    """
+    media_type = negotiate_media_type(request)
+    headers = (headers or {}) | VARY_HEADERS
+    if media_type in COLUMNAR_MEDIA_TYPES:
+        content = _columnar(batches, arrow_schema, parquet=media_type == PARQUET_MEDIA_TYPE)
+        return StreamingResponse(content, media_type=media_type, headers=headers)
+    if media_type == NDJSON_MEDIA_TYPE:
+        return StreamingResponse(_ndjson(batches), media_type=media_type, headers=headers)
+    return StreamingResponse(_json_array(batches), media_type=media_type, headers=headers)
@@ -0,0 +1,130 @@
+"""Counts and volume of the cocktails by time bucket, machine, recipe and language, kept up to date on every insert.
+
+New cocktails are added to hourly rollups, which get compacted into daily ones after some days.
+Cocktails made before that (e.g. sent after being offline) are added to the daily rollups directly,
+so the hourly rollups of the compacted days are never changed while they get compacted.
+"""
+
+from collections.abc import Sequence
+from datetime import datetime, time, timedelta
+from typing import Any
+
+from models import CocktailDocument, DailyRollupDocument, HourlyRollupDocument
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from utils import TEST_COCKTAIL_PATTERN, is_test_cocktail
+
+# days the hourly rollups are kept before they are compacted into daily ones
+HOURLY_ROLLUP_DAYS = 7
+COMPACTION_BATCH_SIZE = 1000
+
+_DUPLICATE_KEY_ERROR = 11000
+_KEY_FIELDS = ("machinename", "cocktailname", "countrycode")
+_KEY_VALUES = tuple(f"${field}" for field in _KEY_FIELDS)
+
+
+def compaction_cutoff(now: datetime) -> datetime:
+    """Get the start of the first day, which is not compacted yet."""
+    return datetime.combine(now.date() - timedelta(days=HOURLY_ROLLUP_DAYS), time.min)
+
+
+def _daily_from(now: datetime) -> datetime:
+    # one day ahead of the compaction, so there are no inserts into the hourly rollups it compacts
+    return compaction_cutoff(now) + timedelta(days=1)
+
+
+def _hour(date: datetime) -> datetime:
+    return date.replace(minute=0, second=0, microsecond=0)
+
+
+def _day(date: datetime) -> datetime:
+    return datetime.combine(date.date(), time.min)
+
+
+async def add_cocktails(cocktails: Sequence[CocktailDocument]) -> None:
+    """Add the inserted cocktails to the rollups, test cocktails are not counted."""
+    daily_from = _daily_from(datetime.now())
+    totals: dict[tuple[type[HourlyRollupDocument], datetime | None, str, str, str], list[int]] = {}
+    key: tuple[type[HourlyRollupDocument], datetime | None, str, str, str]
+    for cocktail in cocktails:
+        if is_test_cocktail(cocktail.cocktailname):
+            continue
+        made = cocktail.makedate
+        if made is not None and made < daily_from:
+            key = (DailyRollupDocument, _day(made), cocktail.machinename, cocktail.cocktailname, cocktail.countrycode)
+        else:
+            hour = _hour(made) if made is not None else None
+            key = (HourlyRollupDocument, hour, cocktail.machinename, cocktail.cocktailname, cocktail.countrycode)
+        total = totals.setdefault(key, [0, 0])
+        total[0] += 1
+        total[1] += cocktail.volume
+    for model in (HourlyRollupDocument, DailyRollupDocument):
+        updates = [
+            UpdateOne(
+                {"date": date, **dict(zip(_KEY_FIELDS, names, strict=True))},
+                {"$inc": {"cocktails": count, "volume": volume}},
+                upsert=True,
+            )
+            for (key_model, date, *names), (count, volume) in totals.items()
+            if key_model is model
+        ]
+        if updates:
+            await model.get_pymongo_collection().bulk_write(updates, ordered=False)
+
+
+async def compact_rollups(last_run: datetime | None) -> int:
+    """Move the hourly rollups of the days older than the retention into the daily rollups.
+
+    Each daily rollup stores the ids of the merged hourly ones, an already merged one fails with a duplicate key.
+    So an interrupted compaction can be run again without counting the hourly rollups twice.
+    """
+    cutoff = compaction_cutoff(datetime.now())
+    hourly = HourlyRollupDocument.get_pymongo_collection()
+    daily = DailyRollupDocument.get_pymongo_collection()
+    compacted = 0
+    while batch := await hourly.find({"date": {"$lt": cutoff}}).limit(COMPACTION_BATCH_SIZE).to_list():
+        updates = [
+            UpdateOne(
+                {
+                    "date": _day(rollup["date"]),
+                    **{field: rollup[field] for field in _KEY_FIELDS},
+                    "merged": {"$ne": rollup["_id"]},
+                },
+                {
+                    "$inc": {"cocktails": rollup["cocktails"], "volume": rollup["volume"]},
+                    "$push": {"merged": rollup["_id"]},
+                },
+                upsert=True,
+            )
+            for rollup in batch
+        ]
+        try:
+            await daily.bulk_write(updates, ordered=False)
+        except BulkWriteError as err:
+            if any(error["code"] != _DUPLICATE_KEY_ERROR for error in err.details["writeErrors"]):
+                raise
+        await hourly.delete_many({"_id": {"$in": [rollup["_id"] for rollup in batch]}})
+        compacted += len(batch)
+    return compacted
+
+
+async def rebuild_rollups() -> None:
+    """Build the rollups from all cocktails, replacing the existing ones. The app should not run meanwhile."""
+    daily_from = _daily_from(datetime.now())
+    # not yet migrated date strings can not be truncated, they are counted like missing dates
+    made_date = {"$cond": [{"$eq": [{"$type": "$makedate"}, "date"]}, "$makedate", None]}
+    real_cocktails = {"cocktailname": {"$not": TEST_COCKTAIL_PATTERN}}
+    targets: list[tuple[type[HourlyRollupDocument], dict[str, Any], str]] = [
+        (HourlyRollupDocument, {"$not": {"$lt": daily_from}}, "hour"),
+        (DailyRollupDocument, {"$lt": daily_from}, "day"),
+    ]
+    for model, made_range, unit in targets:
+        keys = {"date": {"$dateTrunc": {"date": made_date, "unit": unit}}} | dict(zip(_KEY_FIELDS, _KEY_VALUES))
+        pipeline: list[dict[str, Any]] = [
+            {"$match": real_cocktails | {"makedate": made_range}},
+            {"$group": {"_id": keys, "cocktails": {"$sum": 1}, "volume": {"$sum": "$volume"}}},
+            {"$project": {"_id": 0, **{key: f"$_id.{key}" for key in keys}, "cocktails": 1, "volume": 1}},
+            # replaces the collection at once, the indexes are kept
+            {"$out": model.get_collection_name()},
+        ]
+        await (await CocktailDocument.get_pymongo_collection().aggregate(pipeline)).to_list()
@@ -1,15 +1,76 @@
 import datetime
-from typing import Annotated
+from typing import Annotated, Any, Literal
 
+import aggregations
+import summary
+from beanie import PydanticObjectId
+from bson import ObjectId
+from cache import COCKTAILS_CACHE, INSTALLATIONS_CACHE, response_cache
 from core.metadata import Tags
-from fastapi import APIRouter, Request, Security
-from models import ApiKeyDocument, CocktailDocument, InstallationDocument
-from rate_limiting import limiter
-from schemas import CocktailData, CocktailWithoutKey, InstallationData
+from database import read_aggregate, read_collection, read_rows
+from environment import COCKTAIL_TIMESERIES
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, Security, status
+from fastapi.responses import StreamingResponse
+from ingest import MAX_WRITE_DELAY, IngestBufferFullError, ingest_buffer, track_inserted
+from models import ApiKeyDocument, CocktailDocument, DailyRollupDocument, HourlyRollupDocument, InstallationDocument
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from rate_limiting import check_ingest_quota, limiter
+from responses import (
+    STREAM_RESPONSES,
+    cache_headers,
+    make_etag,
+    not_modified,
+    parse_legacy_dates,
+    stream_rows,
+)
+from schemas import (
+    COCKTAIL_ARROW_SCHEMA,
+    INSTALLATION_ARROW_SCHEMA,
+    BatchItemResult,
+    BatchResult,
+    CocktailData,
+    CocktailEntry,
+    CocktailFilter,
+    CocktailWithoutKey,
+    InstallationData,
+    InstallationStats,
+    LandEnum,
+    RecipeStats,
+    RollupStats,
+    ServingStats,
+    SummaryStats,
+    TimeStats,
+    VolumeStats,
+)
 from security import get_api_key
+from utils import utc_now
 
-DATEFORMAT_STR = "%d/%m/%Y, %H:%M"
 MAX_NAME_LENGTH = 30
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 1000
+# the cocktails of a batch are validated one by one, so they are received as dicts, the spec still shows their schema
+BATCH_OPENAPI = {
+    "requestBody": {
+        "content": {"application/json": {"schema": {"items": {"$ref": "#/components/schemas/CocktailData"}}}}
+    }
+}
+# seconds a client should wait if the ingest buffer is full
+INGEST_RETRY_AFTER = 5
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+WATERMARK_HEADER = "X-Watermark"
+# the ids of the cocktails are created at (time series migration: set to) the receivedate, with this tolerance
+ID_TIME_TOLERANCE = datetime.timedelta(minutes=1)
+# ids are created before the write, a cocktail may be written this much later (the ingest buffer retries within it),
+# so the watermark stays behind the newest ids
+WATERMARK_LAG = MAX_WRITE_DELAY
+# time series collections got no index on the id, so the cocktails are sorted by their receivedate there
+COCKTAIL_ORDER = "receivedate" if COCKTAIL_TIMESERIES else "_id"
+# only the fields of the response models are read, the documents are sent without validation
+COCKTAIL_FIELDS = dict.fromkeys(CocktailWithoutKey.model_fields, 1) | {"_id": {"$toString": "$_id"}}
+INSTALLATION_FIELDS = {"os": 1, "receivedate": 1}
+COCKTAIL_DATES = ("makedate", "receivedate")
+INSTALLATION_DATES = ("receivedate",)
 
 router = APIRouter(prefix="/api/v1", tags=[Tags.PROTECTED])
 public_router = APIRouter(prefix="/api/v1/public", tags=[Tags.PUBLIC])
@@ -27,29 +88,216 @@ async def check_api(
 async def insert_cocktaildata(
     cocktail: CocktailData,
     api_key: Annotated[ApiKeyDocument, Security(get_api_key)],
+    response: Response,
 ) -> CocktailDocument:
     """Insert the cocktail data into the database.
 
+    If the ingest buffer is enabled, the cocktail is written a moment later (status 202).
+    Each API key got a quota, the remaining cocktails are in the `X-RateLimit-Remaining` header.
     Route is protected by API key.
     """
-    return await CocktailDocument(
+    check_ingest_quota(str(api_key.id), 1, response)
+    if ingest_buffer.enabled:
+        document = _build_cocktail_document(cocktail, api_key)
+        document.id = PydanticObjectId()
+        try:
+            ingest_buffer.put(document)
+        except IngestBufferFullError as err:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many cocktails at the moment, please try again later",
+                headers={"Retry-After": str(INGEST_RETRY_AFTER)},
+            ) from err
+        response.status_code = status.HTTP_202_ACCEPTED
+        return document
+    document = await _build_cocktail_document(cocktail, api_key).create()
+    await track_inserted([document])
+    return document
+
+
+@router.post("/cocktails/batch", tags=[Tags.COCKTAIL], openapi_extra=BATCH_OPENAPI)
+async def insert_cocktaildata_batch(
+    cocktails: Annotated[list[dict[str, Any]], Body(min_length=1, max_length=MAX_BATCH_SIZE)],
+    api_key: Annotated[ApiKeyDocument, Security(get_api_key)],
+    response: Response,
+) -> BatchResult:
+    """Insert multiple cocktail data (same format as for a single cocktail) into the database at once.
+
+    Use this to send the cocktails collected while being offline.
+    Each cocktail is validated on its own, the result contains which cocktails were accepted or rejected.
+    Every valid cocktail counts against the quota of the API key (see the single cocktail route),
+    even if it is rejected by the database afterwards, the invalid ones are not counted.
+    Route is protected by API key.
+    """
+    results = [BatchItemResult(index=index, accepted=True) for index in range(len(cocktails))]
+    documents: dict[int, CocktailDocument] = {}
+    for index, data in enumerate(cocktails):
+        try:
+            cocktail = CocktailData.model_validate(data)
+        except ValidationError as err:
+            results[index] = _rejected(index, err)
+            continue
+        # set the id already, so we know which one are inserted if some writes fail
+        documents[index] = _build_cocktail_document(cocktail, api_key)
+        documents[index].id = PydanticObjectId()
+    check_ingest_quota(str(api_key.id), len(documents), response)
+    if documents:
+        indices = list(documents)
+        try:
+            await CocktailDocument.insert_many(documents.values(), ordered=False)
+        except BulkWriteError as err:
+            for write_error in err.details["writeErrors"]:
+                index = indices[write_error["index"]]
+                results[index] = BatchItemResult(index=index, accepted=False, error=write_error["errmsg"])
+                del documents[index]
+        await track_inserted(list(documents.values()))
+    accepted = len(documents)
+    return BatchResult(accepted=accepted, rejected=len(results) - accepted, items=results)
+
+
+def _build_cocktail_document(cocktail: CocktailData, api_key: ApiKeyDocument) -> CocktailDocument:
+    return CocktailDocument(
         cocktailname=cocktail.cocktailname[:MAX_NAME_LENGTH],
         volume=cocktail.volume,
         machinename=cocktail.machinename[:MAX_NAME_LENGTH],
         countrycode=cocktail.countrycode,
         keyname=api_key.name,
         makedate=cocktail.makedate,
-        receivedate=datetime.datetime.now().strftime(DATEFORMAT_STR),
-    ).create()
+        receivedate=utc_now(),
+    )
+
 
+def _rejected(index: int, err: ValidationError) -> BatchItemResult:
+    reason = "; ".join(f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in err.errors())
+    return BatchItemResult(index=index, accepted=False, error=reason)
 
-@public_router.get("/cocktails", tags=[Tags.COCKTAIL])
-async def get_cocktaildata() -> list[CocktailWithoutKey]:
+
+@public_router.get(
+    "/cocktails",
+    tags=[Tags.COCKTAIL],
+    response_model=list[CocktailEntry],
+    responses=STREAM_RESPONSES,
+)
+async def get_cocktaildata(
+    request: Request,
+    after: Annotated[
+        PydanticObjectId | None, Query(description=f"Only return data after this cursor, see `{NEXT_CURSOR_HEADER}`.")
+    ] = None,
+    since: Annotated[
+        PydanticObjectId | None, Query(description=f"Only return data inserted after this `{WATERMARK_HEADER}`.")
+    ] = None,
+    limit: Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE, description="Maximum number of entries.")] = None,
+) -> Response:
     """Get the cocktail data from the database.
 
+    The data is streamed in insertion order, as json array or as ndjson if `application/x-ndjson` is accepted.
+    For the columnar formats, accept `application/vnd.apache.arrow.stream` or `application/vnd.apache.parquet`.
+    If a limit is given and there is more data, the cursor for the next page is in the `X-Next-Cursor` header.
+    The `X-Watermark` header is a bit behind the newest entry included, since older ids may still be written.
+    Use it as `since` to only get new data next time, entries after it are sent again, skip them by their `_id`.
+    Send the `ETag` as `If-None-Match` to get a 304 without any data if nothing changed.
     Route is open accessible.
     """
-    return await CocktailDocument.find_all().project(CocktailWithoutKey).to_list()
+    etag = make_etag(request, await summary.get_version("cocktails_version"), after, since, limit)
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    # the etag contains the data version, the parameters and the media type, so it identifies the response
+    return await response_cache.get_or_build(
+        COCKTAILS_CACHE, etag, lambda: _build_cocktail_response(request, after, since, limit, etag)
+    )
+
+
+async def _build_cocktail_response(
+    request: Request,
+    after: PydanticObjectId | None,
+    since: PydanticObjectId | None,
+    limit: int | None,
+    etag: str,
+) -> StreamingResponse:
+    lower_bounds = [bound for bound in (after, since) if bound is not None]
+    id_range = {"$gt": max(lower_bounds)} if lower_bounds else {}
+    headers = cache_headers(etag)
+    # both the page end and the watermark only touch the index of the order, so the data itself can still be streamed
+    upper_bound = None
+    if limit is not None:
+        upper_bound = await _get_nth_cocktail_id(id_range, limit)
+        if upper_bound is not None:
+            headers[NEXT_CURSOR_HEADER] = str(upper_bound)
+    if upper_bound is None:
+        upper_bound = await _get_newest_cocktail_id(id_range)
+    # bounding the query ends the page at its cursor, even if there are inserts meanwhile
+    if upper_bound is not None:
+        id_range["$lte"] = upper_bound
+    watermark = _settled_watermark(upper_bound, since)
+    if watermark is not None:
+        headers[WATERMARK_HEADER] = str(watermark)
+    cocktails = read_rows(CocktailDocument, _cocktail_query(id_range), COCKTAIL_FIELDS, COCKTAIL_ORDER)
+    return stream_rows(request, parse_legacy_dates(cocktails, COCKTAIL_DATES), COCKTAIL_ARROW_SCHEMA, headers)
+
+
+def _settled_watermark(upper_bound: PydanticObjectId | None, since: PydanticObjectId | None) -> PydanticObjectId | None:
+    """Get the watermark up to which no more cocktails are written, it is never before the given one.
+
+    The id order is not the write order, so the newest ids (within the lag) are not included.
+    """
+    if upper_bound is None:
+        return since
+    settled = PydanticObjectId(ObjectId.from_datetime(datetime.datetime.now(datetime.UTC) - WATERMARK_LAG))
+    watermark = min(upper_bound, settled)
+    return watermark if since is None else max(watermark, since)
+
+
+async def _get_nth_cocktail_id(id_range: dict[str, PydanticObjectId], n: int) -> PydanticObjectId | None:
+    """Get the id of the n-th cocktail in the id range, if there are that many.
+
+    The cocktails are counted in their order, sorted by receivedate the ids are only nearly in order.
+    Still each cocktail is either up to or after the returned id, so the pages do not overlap or miss any.
+    """
+    cursor = read_collection(CocktailDocument).find(_cocktail_query(id_range), {"_id": 1}).sort(COCKTAIL_ORDER)
+    entries = await cursor.skip(n - 1).limit(1).to_list()
+    return PydanticObjectId(entries[0]["_id"]) if entries else None
+
+
+async def _get_newest_cocktail_id(id_range: dict[str, PydanticObjectId]) -> PydanticObjectId | None:
+    """Get the highest id in the id range.
+
+    Time series collections got no index on the id, so the last received cocktail is looked up first.
+    Higher ids can only be received up to twice the tolerance before it, so only those are sorted by id.
+    """
+    collection = read_collection(CocktailDocument)
+    query = _cocktail_query(id_range)
+    if COCKTAIL_TIMESERIES:
+        newest = await collection.find(query, {"receivedate": 1}).sort("receivedate", -1).limit(1).to_list()
+        if not newest:
+            return None
+        recent = {"receivedate": {"$gte": newest[0]["receivedate"] - 2 * ID_TIME_TOLERANCE}}
+        query = {"$and": [query, recent]}
+    entries = await collection.find(query, {"_id": 1}).sort("_id", -1).limit(1).to_list()
+    return PydanticObjectId(entries[0]["_id"]) if entries else None
+
+
+def _cocktail_query(id_range: dict[str, PydanticObjectId]) -> dict[str, Any]:
+    """Build the query of the cocktails in the id range.
+
+    Time series collections got no index on the id, only the receivedate limits the buckets which are read.
+    So the id range is also applied to the receivedate there, ids and receivedates differ less than the tolerance.
+    """
+    query: dict[str, Any] = {"_id": id_range} if id_range else {}
+    if not COCKTAIL_TIMESERIES:
+        return query
+    time_range = {}
+    if "$gt" in id_range:
+        time_range["$gte"] = _id_time(id_range["$gt"]) - ID_TIME_TOLERANCE
+    if "$lte" in id_range:
+        time_range["$lte"] = _id_time(id_range["$lte"]) + ID_TIME_TOLERANCE
+    if time_range:
+        query["receivedate"] = time_range
+    return query
+
+
+def _id_time(object_id: PydanticObjectId) -> datetime.datetime:
+    # dates are stored without timezone in UTC
+    return object_id.generation_time.replace(tzinfo=None)
 
 
 @public_router.post("/installation", tags=[Tags.INSTALLATION])
@@ -59,18 +307,39 @@ async def post_installation(request: Request, information: InstallationData) ->
 
     Route is open accessible.
     """
-    return await InstallationDocument(
-        os=information.os_version, receivedate=datetime.datetime.now().strftime(DATEFORMAT_STR)
-    ).create()
+    document = await InstallationDocument(os=information.os_version, receivedate=utc_now()).create()
+    await summary.add_installation()
+    await response_cache.invalidate(INSTALLATIONS_CACHE)
+    return document
 
 
-@public_router.get("/installations", tags=[Tags.INSTALLATION])
-async def get_installations() -> list[InstallationDocument]:
+@public_router.get(
+    "/installations",
+    tags=[Tags.INSTALLATION],
+    response_model=list[InstallationDocument],
+    responses=STREAM_RESPONSES,
+)
+async def get_installations(request: Request) -> Response:
     """Endpoint to receive information about successful installation.
 
+    Also available as ndjson or in the columnar formats `application/vnd.apache.arrow.stream` and
+    `application/vnd.apache.parquet`.
+    Send the `ETag` as `If-None-Match` to get a 304 without any data if nothing changed.
     Route is open accessible.
     """
-    return await InstallationDocument.find_all().to_list()
+    etag = make_etag(request, await summary.get_version("installations_version"))
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    return await response_cache.get_or_build(
+        INSTALLATIONS_CACHE,
+        etag,
+        lambda: _build_installation_response(request, etag),
+    )
+
+
+async def _build_installation_response(request: Request, etag: str) -> StreamingResponse:
+    installations = parse_legacy_dates(read_rows(InstallationDocument, {}, INSTALLATION_FIELDS), INSTALLATION_DATES)
+    return stream_rows(request, installations, INSTALLATION_ARROW_SCHEMA, cache_headers(etag))
 
 
 @public_router.get("/installations/count", tags=[Tags.INSTALLATION])
@@ -79,5 +348,108 @@ async def get_installation_count() -> int:
 
     Route is open accessible.
     """
-    installation_data = await InstallationDocument.find_all().to_list()
-    return len(installation_data)
+    return (await summary.get_summary()).installations
+
+
+def get_cocktail_filter(
+    countrycodes: Annotated[list[LandEnum] | None, Query(description="Languages to include.")] = None,
+    machines: Annotated[list[str] | None, Query(description="Machines to include.")] = None,
+    recipes: Annotated[list[str] | None, Query(description="Recipes to include.")] = None,
+    start: Annotated[datetime.date | None, Query(description="First day of the made date to include.")] = None,
+    end: Annotated[datetime.date | None, Query(description="Last day of the made date to include.")] = None,
+) -> CocktailFilter:
+    """Collect the dashboard filter options from the query, unset options do not filter."""
+    return CocktailFilter(countrycodes=countrycodes, machines=machines, recipes=recipes, start=start, end=end)
+
+
+@public_router.get("/stats/summary", tags=[Tags.COCKTAIL])
+async def get_summary_stats() -> SummaryStats:
+    """Get the overall numbers of the cocktail data and installations.
+
+    Route is open accessible.
+    """
+    return await summary.get_summary()
+
+
+@public_router.get("/stats/volume", tags=[Tags.COCKTAIL])
+async def get_volume_stats(
+    filters: Annotated[CocktailFilter, Depends(get_cocktail_filter)],
+    country_split: bool = False,
+) -> list[VolumeStats]:
+    """Get the produced volume and number of cocktails by machine, optionally split by language.
+
+    Route is open accessible.
+    """
+    pipeline = aggregations.volume_pipeline(filters, country_split)
+    return await read_aggregate(CocktailDocument, pipeline, VolumeStats)
+
+
+@public_router.get("/stats/recipes", tags=[Tags.COCKTAIL])
+async def get_recipe_stats(
+    filters: Annotated[CocktailFilter, Depends(get_cocktail_filter)],
+    limit: Annotated[int, Query(ge=1)] = 10,
+    country_split: bool = False,
+) -> list[RecipeStats]:
+    """Get the number of cocktails of the most popular recipes, optionally split by language.
+
+    Route is open accessible.
+    """
+    pipeline = aggregations.recipe_pipeline(filters, limit, country_split)
+    return await read_aggregate(CocktailDocument, pipeline, RecipeStats)
+
+
+@public_router.get("/stats/time", tags=[Tags.COCKTAIL])
+async def get_time_stats(
+    filters: Annotated[CocktailFilter, Depends(get_cocktail_filter)],
+    hour_grouping: bool = False,
+    machine_grouping: bool = False,
+) -> list[TimeStats]:
+    """Get the number of cocktails by day or hour, optionally split by machine.
+
+    Route is open accessible.
+    """
+    pipeline = aggregations.time_pipeline(filters, hour_grouping, machine_grouping)
+    return await read_aggregate(CocktailDocument, pipeline, TimeStats)
+
+
+@public_router.get("/stats/rollups", tags=[Tags.COCKTAIL])
+async def get_rollup_stats(
+    filters: Annotated[CocktailFilter, Depends(get_cocktail_filter)],
+    unit: Literal["hour", "day"] = "day",
+    group_by: Annotated[
+        list[Literal["machinename", "cocktailname", "countrycode"]] | None, Query(description="Keys to split by.")
+    ] = None,
+) -> list[RollupStats]:
+    """Get the number of cocktails and their volume by hour or day, optionally split by machine, recipe or language.
+
+    Uses the pre aggregated rollups, so any time range is fast. Test cocktails are not included.
+    Only the last days are available by hour, older days are returned at the start of the day.
+    Route is open accessible.
+    """
+    pipeline = aggregations.rollup_pipeline(
+        filters, DailyRollupDocument.get_collection_name(), unit, list(dict.fromkeys(group_by or []))
+    )
+    return await read_aggregate(HourlyRollupDocument, pipeline, RollupStats)
+
+
+@public_router.get("/stats/servings", tags=[Tags.COCKTAIL])
+async def get_serving_stats(
+    filters: Annotated[CocktailFilter, Depends(get_cocktail_filter)],
+    machine_split: bool = False,
+    min_count: Annotated[int, Query(ge=0)] = 0,
+) -> list[ServingStats]:
+    """Get the number of cocktails by serving size, optionally split by machine.
+
+    Route is open accessible.
+    """
+    pipeline = aggregations.serving_pipeline(filters, machine_split, min_count)
+    return await read_aggregate(CocktailDocument, pipeline, ServingStats)
+
+
+@public_router.get("/stats/installations", tags=[Tags.INSTALLATION])
+async def get_installation_stats() -> list[InstallationStats]:
+    """Get the number of installations by operating system.
+
+    Route is open accessible.
+    """
+    return await read_aggregate(InstallationDocument, aggregations.installation_pipeline(), InstallationStats)
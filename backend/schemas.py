@@ -1,6 +1,28 @@
+from datetime import date, datetime
 from enum import Enum
+from typing import Annotated, Any
 
-from pydantic import BaseModel
+import pyarrow as pa
+from pydantic import BaseModel, BeforeValidator, Field
+
+DATEFORMAT_STR = "%d/%m/%Y, %H:%M"
+
+
+def parse_legacy_date(value: Any) -> Any:
+    """Parse dates in the format CocktailBerry sends (and used to be stored), leave everything else to pydantic."""
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, DATEFORMAT_STR)
+        except ValueError:
+            return value
+    return value
+
+
+LegacyDatetime = Annotated[datetime, BeforeValidator(parse_legacy_date)]
+
+# strings with only a few distinct values are dictionary encoded, dates are stored with ms precision by mongo
+_ARROW_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+_ARROW_DATETIME = pa.timestamp("ms")
 
 
 class LandEnum(str, Enum):
@@ -17,7 +39,23 @@ class CocktailData(BaseModel):
     volume: int
     machinename: str
     countrycode: LandEnum
-    makedate: str
+    makedate: LegacyDatetime
+
+
+class BatchItemResult(BaseModel):
+    """Result for one cocktail of a batch, index is the position in the sent list."""
+
+    index: int
+    accepted: bool
+    error: str | None = None
+
+
+class BatchResult(BaseModel):
+    """Result of a batch insert, with the result for each cocktail."""
+
+    accepted: int
+    rejected: int
+    items: list[BatchItemResult]
 
 
 class CocktailWithoutKey(BaseModel):
@@ -27,11 +65,142 @@ class CocktailWithoutKey(BaseModel):
     volume: int
     machinename: str
     countrycode: LandEnum
-    makedate: str
-    receivedate: str
+    makedate: LegacyDatetime
+    receivedate: LegacyDatetime
+
+
+class CocktailEntry(CocktailWithoutKey):
+    """Cocktail data as sent by the public route, with its id to skip entries which are sent again."""
+
+    id: str = Field(alias="_id")
+
+
+COCKTAIL_ARROW_SCHEMA = pa.schema(
+    [
+        ("_id", pa.string()),
+        ("cocktailname", _ARROW_CATEGORY),
+        ("volume", pa.int32()),
+        ("machinename", _ARROW_CATEGORY),
+        ("countrycode", _ARROW_CATEGORY),
+        ("makedate", _ARROW_DATETIME),
+        ("receivedate", _ARROW_DATETIME),
+    ]
+)
 
 
 class InstallationData(BaseModel):
     """Model for all needed cocktail data."""
 
     os_version: str
+
+
+INSTALLATION_ARROW_SCHEMA = pa.schema([("os", _ARROW_CATEGORY), ("receivedate", _ARROW_DATETIME)])
+
+
+class CocktailFilter(BaseModel):
+    """Filter options for the cocktail statistics, unset options do not filter."""
+
+    countrycodes: list[LandEnum] | None = None
+    machines: list[str] | None = None
+    recipes: list[str] | None = None
+    start: date | None = None
+    end: date | None = None
+
+
+class VolumeStats(BaseModel):
+    """Produced volume and cocktail count by machine (and language)."""
+
+    machinename: str
+    countrycode: LandEnum | None = None
+    volume: float = Field(description="Cocktail volume in litre.")
+    count: int
+
+
+class RecipeStats(BaseModel):
+    """Number of cocktails made by recipe (and language)."""
+
+    cocktailname: str
+    countrycode: LandEnum | None = None
+    count: int
+
+
+class TimeStats(BaseModel):
+    """Number of cocktails made in the time interval (and by machine)."""
+
+    date: datetime
+    machinename: str | None = None
+    count: int
+
+
+class RollupStats(BaseModel):
+    """Number of cocktails and their volume in the time interval (None: no made date) by the grouped keys."""
+
+    date: datetime | None
+    machinename: str | None = None
+    cocktailname: str | None = None
+    countrycode: LandEnum | None = None
+    count: int
+    volume: float = Field(description="Cocktail volume in litre.")
+
+
+class ServingStats(BaseModel):
+    """Number of cocktails made by serving size (and machine)."""
+
+    volume: int = Field(description="Serving size rounded to the closest 25 ml.")
+    machinename: str | None = None
+    count: int
+
+
+class InstallationStats(BaseModel):
+    """Number of installations by operating system."""
+
+    os: str
+    count: int
+
+
+class SummaryStats(BaseModel):
+    """Overall numbers of all the cocktail data."""
+
+    cocktails: int = 0
+    volume: float = Field(default=0.0, description="Cocktail volume in litre.")
+    first_date: datetime | None = None
+    last_date: datetime | None = None
+    machines: int = Field(default=0, description="Number of different machines.")
+    recipes: int = Field(default=0, description="Number of different recipes.")
+    languages: int = Field(default=0, description="Number of different languages.")
+    installations: int = 0
+
+
+class LiveStatus(BaseModel):
+    """The app is running."""
+
+    alive: bool
+
+
+class PoolStats(BaseModel):
+    """Connections of the database connection pool."""
+
+    max_size: int | None = Field(description="Maximum connections per server, None if unlimited.")
+    open: int
+    in_use: int
+    waiting: int = Field(description="Requests waiting for a connection.")
+    failed_checkouts: int = Field(description="Requests which did not get a connection since the start.")
+
+
+class StartupTimes(BaseModel):
+    """Seconds the startup of the app took, unset if not measured (yet)."""
+
+    imports: float | None = Field(default=None, description="Process start until the app is imported.")
+    startup: float | None = Field(default=None, description="Startup until requests are served.")
+    deferred: float | None = Field(default=None, description="Startup until the background work is done.")
+    cold_start: float | None = Field(default=None, description="Process start until requests are served.")
+
+
+class ReadyStatus(BaseModel):
+    """The app can serve requests, if the database answered the write and read client recently."""
+
+    ready: bool
+    ingest_buffer: bool = Field(description="The ingest buffer writes the cocktails, true if it is disabled.")
+    last_ping: dict[str, datetime | None] = Field(description="Last successful database ping by client.")
+    pools: dict[str, PoolStats] = Field(description="Connection pool by client.")
+    startup: StartupTimes
@@ -1,18 +1,64 @@
+import time
+from collections import OrderedDict
+
 from fastapi import HTTPException, Security, status
 from fastapi.security import APIKeyHeader
 from models import ApiKeyDocument
 
 api_key_header = APIKeyHeader(name="x-api-key", auto_error=False)
 
+API_KEY_CACHE_SIZE = 1024
+API_KEY_CACHE_TTL = 5 * 60
+# unknown keys are cached shorter, so new keys are usable fast
+UNKNOWN_API_KEY_CACHE_TTL = 30
+
+
+class ApiKeyCache:
+    """LRU cache for the looked up API keys, which expire after some time.
+
+    Unknown keys are cached as well (as None), so invalid requests do not hit the database either.
+    Each process got its own cache, the ttl limits how long a revoked key is valid in other processes.
+    """
+
+    def __init__(self, max_size: int, ttl: float, unknown_ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.unknown_ttl = unknown_ttl
+        self._entries: OrderedDict[str, tuple[float, ApiKeyDocument | None]] = OrderedDict()
+
+    def get(self, api_key: str) -> tuple[bool, ApiKeyDocument | None]:
+        """Return if the key is cached and the cached document."""
+        entry = self._entries.get(api_key)
+        if entry is None:
+            return False, None
+        expires_at, document = entry
+        if expires_at < time.monotonic():
+            del self._entries[api_key]
+            return False, None
+        self._entries.move_to_end(api_key)
+        return True, document
+
+    def set(self, api_key: str, document: ApiKeyDocument | None) -> None:
+        ttl = self.ttl if document is not None else self.unknown_ttl
+        self._entries[api_key] = (time.monotonic() + ttl, document)
+        self._entries.move_to_end(api_key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, api_key: str) -> None:
+        self._entries.pop(api_key, None)
+
+
+api_key_cache = ApiKeyCache(API_KEY_CACHE_SIZE, API_KEY_CACHE_TTL, UNKNOWN_API_KEY_CACHE_TTL)
+
 
 async def get_api_key(
-    api_key_header: str = Security(api_key_header),
+    api_key_header: str | None = Security(api_key_header),
 ) -> ApiKeyDocument:
-    """Retrieve and validate an API key from the query parameters or HTTP header.
+    """Retrieve and validate an API key from the HTTP header.
 
     Args:
     ----
-        api_key_query: The API key passed as a query parameter.
         api_key_header: The API key passed in the HTTP header.
 
     Returns:
@@ -24,10 +70,25 @@ async def get_api_key(
         HTTPException: If the API key is invalid or missing.
 
     """
-    api_key = await ApiKeyDocument.find(ApiKeyDocument.api_key == api_key_header).first_or_none()
-    if api_key is not None:
+    api_key = None
+    if api_key_header is not None:
+        cached, api_key = api_key_cache.get(api_key_header)
+        if not cached:
+            api_key = await ApiKeyDocument.find(ApiKeyDocument.api_key == api_key_header).first_or_none()
+            api_key_cache.set(api_key_header, api_key)
+    if api_key is not None and not api_key.invalid:
         return api_key
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid or missing API Key",
     )
+
+
+async def revoke_api_key(api_key: str) -> bool:
+    """Mark the API key as invalid and remove it from the cache of this process, returns if the key exists.
+
+    Other processes, like the workers of the running app, accept the key until its cache entry expires.
+    """
+    result = await ApiKeyDocument.get_pymongo_collection().update_one({"api_key": api_key}, {"$set": {"invalid": True}})
+    api_key_cache.invalidate(api_key)
+    return result.matched_count > 0
@@ -0,0 +1,135 @@
+import logging
+from collections.abc import Sequence
+from typing import Any, Literal
+
+from database import read_aggregate, read_collection
+from models import CocktailDocument, InstallationDocument, SummaryDocument
+from schemas import DATEFORMAT_STR, SummaryStats
+from utils import TEST_COCKTAIL_PATTERN, is_test_cocktail
+
+_logger = logging.getLogger(__name__)
+
+SUMMARY_ID = "summary"
+
+
+async def add_cocktails(cocktails: Sequence[CocktailDocument]) -> None:
+    """Atomically add the inserted cocktails to the summary, test cocktails only change the version."""
+    if not cocktails:
+        return
+    update: dict[str, Any] = {"$inc": {"cocktails_version": 1}}
+    cocktails = [cocktail for cocktail in cocktails if not is_test_cocktail(cocktail.cocktailname)]
+    if cocktails:
+        update["$inc"] |= {"cocktails": len(cocktails), "volume": sum(cocktail.volume for cocktail in cocktails)}
+        update["$addToSet"] = {
+            "machines": {"$each": list({cocktail.machinename for cocktail in cocktails})},
+            "recipes": {"$each": list({cocktail.cocktailname for cocktail in cocktails})},
+            "languages": {"$each": list({cocktail.countrycode for cocktail in cocktails})},
+        }
+    # a missing date would be lower than any date, so only use the existing ones
+    dates = [cocktail.makedate for cocktail in cocktails if cocktail.makedate is not None]
+    if dates:
+        update["$min"] = {"first_date": min(dates)}
+        update["$max"] = {"last_date": max(dates)}
+    await SummaryDocument.get_pymongo_collection().update_one({"_id": SUMMARY_ID}, update, upsert=True)
+
+
+async def remove_cocktails() -> None:
+    """Change the version after cocktails got deleted (the deleted ones were never counted) or moved."""
+    await SummaryDocument.get_pymongo_collection().update_one(
+        {"_id": SUMMARY_ID}, {"$inc": {"cocktails_version": 1}}, upsert=True
+    )
+
+
+async def add_installation() -> None:
+    """Atomically count the new installation in the summary."""
+    await SummaryDocument.get_pymongo_collection().update_one(
+        {"_id": SUMMARY_ID}, {"$inc": {"installations": 1, "installations_version": 1}}, upsert=True
+    )
+
+
+async def get_version(field: Literal["cocktails_version", "installations_version"]) -> int:
+    """Get the version of the collection, which changes with every write to it.
+
+    It is read like the public data, so a lagging secondary gives the version matching its data.
+    """
+    summary = await read_collection(SummaryDocument).find_one({"_id": SUMMARY_ID}, {field: 1})
+    return summary.get(field, 0) if summary is not None else 0
+
+
+async def ensure_summary() -> int:
+    """Build the summary from the existing data, if it was not built yet, returns the counted cocktails."""
+    summary = await SummaryDocument.get(SUMMARY_ID)
+    if summary is not None and summary.built:
+        return 0
+    _logger.info("Summary was not built yet, building it from the existing data.")
+    return await rebuild_summary()
+
+
+async def rebuild_summary() -> int:
+    """Build the summary from the existing data again, like after the stored cocktails were changed by a migration.
+
+    Only the totals are replaced and the cocktail version is incremented, so the versions never go back.
+    Inserts while it is built may not be counted. Returns the counted cocktails.
+    """
+    summary = await _build_summary()
+    totals = summary.model_dump(exclude={"id", "cocktails_version", "installations_version"})
+    await SummaryDocument.get_pymongo_collection().update_one(
+        {"_id": SUMMARY_ID}, {"$set": totals, "$inc": {"cocktails_version": 1}}, upsert=True
+    )
+    _logger.info("Built the summary from the existing data.")
+    return summary.cocktails
+
+
+async def _build_summary() -> SummaryDocument:
+    # not yet migrated dates are still strings (the format is the same in MongoDB), missing values are ignored
+    makedate = {
+        "$cond": [
+            {"$eq": [{"$type": "$makedate"}, "string"]},
+            {"$dateFromString": {"dateString": "$makedate", "format": DATEFORMAT_STR, "onError": None}},
+            "$makedate",
+        ]
+    }
+    pipeline: list[dict[str, Any]] = [
+        {"$match": {"cocktailname": {"$not": TEST_COCKTAIL_PATTERN}}},
+        {
+            "$group": {
+                "_id": None,
+                "cocktails": {"$sum": 1},
+                "volume": {"$sum": "$volume"},
+                "first_date": {"$min": makedate},
+                "last_date": {"$max": makedate},
+                "machines": {"$addToSet": "$machinename"},
+                "recipes": {"$addToSet": "$cocktailname"},
+                "languages": {"$addToSet": "$countrycode"},
+            }
+        },
+        {"$project": {"_id": 0}},
+    ]
+    totals = await CocktailDocument.aggregate(pipeline).to_list()
+    summary = SummaryDocument(id=SUMMARY_ID, built=True, **(totals[0] if totals else {}))
+    summary.installations = await InstallationDocument.get_pymongo_collection().count_documents({})
+    return summary
+
+
+async def get_summary() -> SummaryStats:
+    """Get the summary, only the number of the distinct values are transferred.
+
+    The summary may have been created by the first installation, so there may be missing values.
+    """
+    pipeline: list[dict[str, Any]] = [
+        {"$match": {"_id": SUMMARY_ID}},
+        {
+            "$project": {
+                "cocktails": {"$ifNull": ["$cocktails", 0]},
+                "volume": {"$divide": [{"$ifNull": ["$volume", 0]}, 1000]},
+                "first_date": 1,
+                "last_date": 1,
+                "machines": {"$size": {"$ifNull": ["$machines", []]}},
+                "recipes": {"$size": {"$ifNull": ["$recipes", []]}},
+                "languages": {"$size": {"$ifNull": ["$languages", []]}},
+                "installations": {"$ifNull": ["$installations", 0]},
+            }
+        },
+    ]
+    summary = await read_aggregate(SummaryDocument, pipeline, SummaryStats)
+    return summary[0] if summary else SummaryStats()
@@ -0,0 +1,4 @@
+import os
+
+# the modules read the connection string on import, the tests never connect to the database
+os.environ.setdefault("ATLAS_URI", "mongodb://localhost:27017")
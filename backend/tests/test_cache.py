@@ -0,0 +1,109 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+from cache import CachedResponse, MemoryCacheBackend, ResponseCache
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+CHUNK = b"x" * 10
+
+
+class Builder:
+    """Builds a streamed response of some chunks and counts how often it was built."""
+
+    def __init__(self, chunks: int, fail_after: int | None = None) -> None:
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.builds = 0
+
+    async def __call__(self) -> Response:
+        self.builds += 1
+        return StreamingResponse(self._body(), media_type="text/plain", headers={"ETag": "etag"})
+
+    async def _body(self) -> AsyncIterator[bytes]:
+        for index in range(self.chunks):
+            if index == self.fail_after:
+                raise RuntimeError("database gone")
+            await asyncio.sleep(0.001)
+            yield CHUNK
+
+
+async def read_body(response: Response) -> bytes:
+    if isinstance(response, StreamingResponse):
+        return b"".join([chunk async for chunk in response.body_iterator])  # type: ignore[misc]
+    return bytes(response.body)
+
+
+async def get_all(cache: ResponseCache, build: Builder, clients: int = 3) -> list[bytes]:
+    async def get() -> bytes:
+        return await read_body(await cache.get_or_build("ns", "key", build))
+
+    return list(await asyncio.gather(*(get() for _ in range(clients))))
+
+
+def test_concurrent_misses_build_once_and_store() -> None:
+    backend = MemoryCacheBackend(1000, 60)
+    cache = ResponseCache(backend)
+    build = Builder(5)
+
+    async def run() -> None:
+        assert await get_all(cache, build) == [CHUNK * 5] * 3
+        # the stored response is served without building it again
+        assert await get_all(cache, build, clients=1) == [CHUNK * 5]
+        cached = await backend.get("ns:key")
+        assert cached is not None
+        assert cached.headers["etag"] == "etag"
+
+    asyncio.run(run())
+    assert build.builds == 1
+
+
+def test_too_big_body_is_shared_but_not_stored() -> None:
+    backend = MemoryCacheBackend(100, 60)
+    cache = ResponseCache(backend)
+    build = Builder(50)
+
+    async def run() -> None:
+        assert await get_all(cache, build) == [CHUNK * 50] * 3
+        assert await backend.get("ns:key") is None
+
+    asyncio.run(run())
+    assert build.builds == 1
+
+
+def test_failed_body_fails_all_clients_and_is_built_again() -> None:
+    cache = ResponseCache(MemoryCacheBackend(1000, 60))
+
+    async def run() -> None:
+        with pytest.raises(RuntimeError):
+            await get_all(cache, Builder(5, fail_after=2))
+        build = Builder(5)
+        assert await get_all(cache, build) == [CHUNK * 5] * 3
+        assert build.builds == 1
+
+    asyncio.run(run())
+
+
+def test_disabled_cache_builds_each_response() -> None:
+    cache = ResponseCache(MemoryCacheBackend(0, 60))
+    build = Builder(5)
+    asyncio.run(get_all(cache, build))
+    assert build.builds == 3
+
+
+def test_memory_backend_drops_least_recently_used() -> None:
+    backend = MemoryCacheBackend(25, 60)
+
+    async def run() -> None:
+        for key in ("a", "b"):
+            await backend.set(key, "ns", CachedResponse(CHUNK, "text/plain"))
+        await backend.get("a")
+        await backend.set("c", "ns", CachedResponse(CHUNK, "text/plain"))
+        assert await backend.get("a") is not None
+        assert await backend.get("b") is None
+        await backend.invalidate("ns")
+        assert await backend.get("a") is None
+        assert backend.size == 0
+
+    asyncio.run(run())
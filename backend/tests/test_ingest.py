@@ -0,0 +1,168 @@
+import asyncio
+import datetime
+from typing import Any
+
+import ingest
+import pytest
+from beanie import PydanticObjectId
+from bson import ObjectId
+from ingest import IngestBuffer, IngestBufferFullError
+from models import CocktailDocument
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+
+def cocktail(age: float = 0) -> CocktailDocument:
+    created = datetime.datetime.now(datetime.UTC) - datetime.timedelta(seconds=age)
+    object_id = ObjectId(ObjectId.from_datetime(created).binary[:4] + ObjectId().binary[4:])
+    # constructed without validation, so no database is needed
+    return CocktailDocument.model_construct(
+        id=PydanticObjectId(object_id),
+        cocktailname="Cuba Libre",
+        volume=250,
+        machinename="machine",
+        countrycode="en",
+        keyname="key",
+        makedate=None,
+        receivedate=created.replace(tzinfo=None),
+    )
+
+
+class Collection:
+    """Stores the written cocktails, the first writes fail, by default after they were applied (like a timeout)."""
+
+    def __init__(self, failures: int = 0, applied: bool = True, unique_ids: bool = True) -> None:
+        self.failures = failures
+        self.applied = applied
+        self.unique_ids = unique_ids
+        self.writes: list[int] = []
+        self.stored: list[PydanticObjectId | None] = []
+
+    async def insert_many(self, documents: list[CocktailDocument], ordered: bool) -> None:
+        self.writes.append(len(documents))
+        if self.failures and not self.applied:
+            self.failures -= 1
+            raise AutoReconnect("no server")
+        duplicates = []
+        for index, document in enumerate(documents):
+            if self.unique_ids and document.id in self.stored:
+                duplicates.append({"index": index, "code": 11000, "errmsg": "duplicate key"})
+            else:
+                self.stored.append(document.id)
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("timeout")
+        if duplicates:
+            raise BulkWriteError({"writeErrors": duplicates})
+
+    async def find_existing(self, batch: list[CocktailDocument]) -> set[PydanticObjectId | None]:
+        return {document.id for document in batch if document.id in self.stored}
+
+
+@pytest.fixture
+def buffer(monkeypatch: pytest.MonkeyPatch) -> IngestBuffer:
+    monkeypatch.setattr(ingest.asyncio, "sleep", _no_sleep)
+    return IngestBuffer(max_size=10, flush_interval=0.01, flush_size=5)
+
+
+async def _no_sleep(_: float) -> None:
+    pass
+
+
+def use(monkeypatch: pytest.MonkeyPatch, collection: Collection, timeseries: bool = False) -> None:
+    monkeypatch.setattr(CocktailDocument, "insert_many", collection.insert_many)
+    monkeypatch.setattr(ingest, "_find_existing", collection.find_existing)
+    monkeypatch.setattr(ingest, "COCKTAIL_TIMESERIES", timeseries)
+
+
+def test_retried_write_skips_duplicates(monkeypatch: pytest.MonkeyPatch, buffer: IngestBuffer) -> None:
+    collection = Collection(failures=1)
+    use(monkeypatch, collection)
+    batch = [cocktail(), cocktail()]
+    assert asyncio.run(buffer._write(batch)) == batch
+    assert collection.writes == [2, 2]
+    assert len(collection.stored) == 2
+
+
+def test_retried_write_on_time_series_skips_written(monkeypatch: pytest.MonkeyPatch, buffer: IngestBuffer) -> None:
+    collection = Collection(failures=1, unique_ids=False)
+    use(monkeypatch, collection, timeseries=True)
+    batch = [cocktail(), cocktail()]
+    assert asyncio.run(buffer._write(batch)) == batch
+    assert collection.writes == [2]
+    assert len(collection.stored) == 2
+
+
+def test_failed_write_is_requeued_and_checked_again(monkeypatch: pytest.MonkeyPatch, buffer: IngestBuffer) -> None:
+    collection = Collection(failures=3, applied=False, unique_ids=False)
+    use(monkeypatch, collection, timeseries=True)
+    document = cocktail()
+
+    async def run() -> list[CocktailDocument]:
+        assert await buffer._write([document]) == []
+        # the last failed attempt was applied after all, so the requeued cocktail is not written again
+        collection.stored.append(document.id)
+        return await buffer._write(await buffer._collect())
+
+    assert asyncio.run(run()) == [document]
+    assert collection.writes == [1, 1, 1]
+    assert len(collection.stored) == 1
+    assert not buffer._unconfirmed
+
+
+def test_cocktails_are_not_written_after_the_write_delay(monkeypatch: pytest.MonkeyPatch, buffer: IngestBuffer) -> None:
+    collection = Collection()
+    use(monkeypatch, collection)
+    recent = cocktail()
+    expired = cocktail(age=ingest.MAX_WRITE_DELAY.total_seconds())
+    assert asyncio.run(buffer._write([expired, recent])) == [recent]
+    assert collection.stored == [recent.id]
+
+
+def test_full_buffer_rejects_cocktails() -> None:
+    buffer = IngestBuffer(max_size=1, flush_interval=0.01, flush_size=5)
+    buffer.put(cocktail())
+    with pytest.raises(IngestBufferFullError):
+        buffer.put(cocktail())
+
+
+def test_stop_writes_the_remaining_cocktails(monkeypatch: pytest.MonkeyPatch) -> None:
+    collection = Collection()
+    use(monkeypatch, collection)
+    tracked: list[int] = []
+
+    async def track(cocktails: list[CocktailDocument]) -> None:
+        tracked.append(len(cocktails))
+
+    monkeypatch.setattr(ingest, "track_inserted", track)
+
+    async def run() -> None:
+        buffer = IngestBuffer(max_size=10, flush_interval=0.01, flush_size=5)
+        buffer.start()
+        for _ in range(7):
+            buffer.put(cocktail())
+        await buffer.stop()
+        assert buffer._queue.empty()
+
+    asyncio.run(run())
+    assert len(collection.stored) == 7
+    assert sum(tracked) == 7
+
+
+def test_track_inserted_logs_errors(monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+    invalidated: list[str] = []
+
+    async def fail(_: Any) -> None:
+        raise RuntimeError("database gone")
+
+    async def invalidate(namespace: str) -> None:
+        invalidated.append(namespace)
+
+    async def ok(_: Any) -> None:
+        pass
+
+    monkeypatch.setattr(ingest.summary, "add_cocktails", fail)
+    monkeypatch.setattr(ingest.rollups, "add_cocktails", ok)
+    monkeypatch.setattr(ingest.response_cache, "invalidate", invalidate)
+    asyncio.run(ingest.track_inserted([cocktail()]))
+    assert invalidated == [ingest.COCKTAILS_CACHE]
+    assert "Could not update the summary" in caplog.text
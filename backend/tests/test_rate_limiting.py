@@ -0,0 +1,49 @@
+import pytest
+import rate_limiting
+from rate_limiting import TokenBucketLimiter
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(rate_limiting.time, "monotonic", clock)
+    return clock
+
+
+def test_requests_wait_until_refilled(clock: Clock) -> None:
+    limiter = TokenBucketLimiter(rate=2, capacity=10)
+    assert limiter.acquire("key", 8) == (True, 2, 0.0)
+    assert limiter.acquire("key", 4) == (False, 2, 1.0)
+    clock.now = 1
+    assert limiter.acquire("key", 4) == (True, 0, 0.0)
+    # other keys got their own bucket
+    assert limiter.acquire("other", 10) == (True, 0, 0.0)
+
+
+def test_bigger_requests_than_the_capacity_go_into_debt(clock: Clock) -> None:
+    limiter = TokenBucketLimiter(rate=1, capacity=10)
+    assert limiter.acquire("key", 25) == (True, -15, 0.0)
+    assert limiter.acquire("key", 1) == (False, -15, 16.0)
+    clock.now = 20
+    assert limiter.acquire("key", 25) == (False, 5, 5.0)
+
+
+def test_only_full_buckets_are_evicted(clock: Clock) -> None:
+    limiter = TokenBucketLimiter(rate=1, capacity=10)
+    limiter.acquire("debt", 20)
+    limiter.acquire("key", 1)
+    clock.now = 15
+    limiter.acquire("other", 1)
+    # the buckets are evicted from the least recently used one, the one in debt is not full yet
+    assert list(limiter._buckets) == ["debt", "key", "other"]
+    clock.now = 30
+    limiter.acquire("other", 1)
+    assert list(limiter._buckets) == ["other"]
@@ -0,0 +1,47 @@
+import pytest
+from fastapi import Request
+from responses import (
+    ARROW_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    PARQUET_MEDIA_TYPE,
+    make_etag,
+    negotiate_media_type,
+)
+
+
+def request(accept: str | None) -> Request:
+    headers = [] if accept is None else [(b"accept", accept.encode())]
+    return Request({"type": "http", "headers": headers})
+
+
+@pytest.mark.parametrize(
+    ("accept", "media_type"),
+    [
+        (None, JSON_MEDIA_TYPE),
+        ("", JSON_MEDIA_TYPE),
+        ("*/*", JSON_MEDIA_TYPE),
+        ("application/*", JSON_MEDIA_TYPE),
+        ("text/html", JSON_MEDIA_TYPE),
+        (ARROW_MEDIA_TYPE, ARROW_MEDIA_TYPE),
+        (f"{NDJSON_MEDIA_TYPE}, {PARQUET_MEDIA_TYPE}", PARQUET_MEDIA_TYPE),
+        (f"{ARROW_MEDIA_TYPE};q=0.5, {JSON_MEDIA_TYPE}", JSON_MEDIA_TYPE),
+        (f"{ARROW_MEDIA_TYPE};q=0.5, */*;q=0.8", JSON_MEDIA_TYPE),
+        (f"{ARROW_MEDIA_TYPE};q=0.9, */*;q=0.8", ARROW_MEDIA_TYPE),
+        (f"{ARROW_MEDIA_TYPE};q=0, {NDJSON_MEDIA_TYPE};q=0.1", NDJSON_MEDIA_TYPE),
+        (f"{ARROW_MEDIA_TYPE};q=0", JSON_MEDIA_TYPE),
+        (f"{ARROW_MEDIA_TYPE};q=invalid", ARROW_MEDIA_TYPE),
+        (f" {PARQUET_MEDIA_TYPE.upper()} ; Q=1", PARQUET_MEDIA_TYPE),
+    ],
+)
+def test_negotiate_media_type(accept: str | None, media_type: str) -> None:
+    assert negotiate_media_type(request(accept)) == media_type
+
+
+def test_etag_changes_with_version_parameters_and_media_type() -> None:
+    etag = make_etag(request(None), 1, "a")
+    assert etag.startswith('W/"1-')
+    assert make_etag(request("*/*"), 1, "a") == etag
+    assert make_etag(request(None), 2, "a") != etag
+    assert make_etag(request(None), 1, "b") != etag
+    assert make_etag(request(ARROW_MEDIA_TYPE), 1, "a") != etag
@@ -1,25 +1,21 @@
 import logging
 import re
-
-from fastapi_utilities import repeat_every
-from models import CocktailDocument
+from datetime import UTC, datetime
 
 _logger = logging.getLogger(__name__)
 
+# cocktails send while testing CocktailBerry, they are not real data and get removed
+TEST_COCKTAIL_PATTERN = re.compile("testcocktail", re.IGNORECASE)
+
+
+def utc_now() -> datetime:
+    """Get the current time like the dates are stored, in UTC without timezone."""
+    return datetime.now(UTC).replace(tzinfo=None)
+
 
 def setup_logging() -> None:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-9s [%(name)s] %(message)s")
 
 
-@repeat_every(seconds=60 * 20)  # 20 minutes
-async def run_cleanup() -> None:
-    """Route which is triggered on deta action."""
-    _logger.warning("Running cleanup")
-    to_delete: list[CocktailDocument] = await CocktailDocument.find(
-        {"cocktailname": re.compile("testcocktail", re.IGNORECASE)}
-    ).to_list()
-    if len(to_delete) > 0:
-        _logger.warning("Deleting %s number of items named testcocktail", len(to_delete))
-    for cocktail in to_delete:
-        _logger.warning("Deleting item: %s", cocktail)
-        await cocktail.delete()
+def is_test_cocktail(cocktailname: str) -> bool:
+    return TEST_COCKTAIL_PATTERN.search(cocktailname) is not None
@@ -0,0 +1,384 @@
+"""Memory and time of the dashboard aggregations, run with `uv run python -m frontend.benchmark` in the root folder.
+
+The data is built like the backend sends it. Each function is compared to its previous implementation, which is
+kept here and runs on the previous layout with plain strings and int64. The peak memory of each function is traced
+by tracemalloc, which only includes the memory allocated through python and numpy.
+"""
+
+import argparse
+import datetime
+import functools
+import inspect
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from . import data
+from .models import CocktailSchema, InstallationData, InstallationSchema, ReceivedData
+
+MACHINES = 250
+RECIPES = 40
+SERVING_SIZES = [100, 150, 200, 250, 300, 350, 400]
+DAYS = 365
+OPERATING_SYSTEMS = [
+    "Debian GNU/Linux 12 (bookworm)",
+    "Raspbian GNU/Linux 12 (bookworm)",
+    "Raspbian GNU/Linux 11 (bullseye)",
+    "Armbian 23.8.1 Bookworm",
+    "Armbian 24.2.1 Jammy",
+    "Ubuntu 22.04.3 LTS",
+    "Windows 10",
+    "",
+]
+
+
+def received_cocktails(rows: int, seed: int = 42) -> bytes:
+    """Get the arrow stream of synthetic cocktails, with the schema of the backend."""
+    rng = np.random.default_rng(seed)
+    # like real data, a few machines and recipes are used most of the time
+    machine_weights = 1 / np.arange(1, MACHINES + 1)
+    recipe_weights = 1 / np.arange(1, RECIPES + 1)
+    dates = np.datetime64("2025-01-01", "ms") + rng.integers(0, DAYS * 24 * 60 * 60 * 1000, rows).astype(
+        "timedelta64[ms]"
+    )
+    category = pa.dictionary(pa.int32(), pa.string())
+    table = pa.table(
+        {
+            ReceivedData.COCKTAILNAME: pa.array(
+                np.array([f"Recipe {number}" for number in range(RECIPES)])[
+                    rng.choice(RECIPES, rows, p=recipe_weights / recipe_weights.sum())
+                ]
+            ).cast(category),
+            ReceivedData.VOLUME: pa.array(rng.choice(SERVING_SIZES, rows) + rng.integers(-5, 6, rows), pa.int32()),
+            ReceivedData.MACHINENAME: pa.array(
+                np.array([f"Machine {number}" for number in range(MACHINES)])[
+                    rng.choice(MACHINES, rows, p=machine_weights / machine_weights.sum())
+                ]
+            ).cast(category),
+            ReceivedData.COUNTRYCODE: pa.array(rng.choice(["en", "de"], rows)).cast(category),
+            ReceivedData.RECEIVEDATE: pa.array(np.sort(dates), pa.timestamp("ms")),
+        }
+    )
+    return _arrow_stream(table)
+
+
+def received_installations(rows: int, seed: int = 42) -> bytes:
+    """Get the arrow stream of synthetic installations over some years, with the schema of the backend."""
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64("2022-01-01", "ms") + rng.integers(0, 4 * DAYS * 24 * 60 * 60 * 1000, rows).astype(
+        "timedelta64[ms]"
+    )
+    table = pa.table(
+        {
+            InstallationData.OS: pa.array(rng.choice(OPERATING_SYSTEMS, rows)).cast(
+                pa.dictionary(pa.int32(), pa.string())
+            ),
+            InstallationData.RECEIVEDATE: pa.array(np.sort(dates), pa.timestamp("ms")),
+        }
+    )
+    return _arrow_stream(table)
+
+
+def _arrow_stream(table: pa.Table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def plain_layout(df: pd.DataFrame) -> pd.DataFrame:
+    """Get the data with the previous types: python strings and int64."""
+    return df.astype(dict.fromkeys(data.CATEGORY_COLUMNS, object) | {CocktailSchema.volume: "int64"})
+
+
+# previous implementations of the dashboard functions, the baseline of the comparison
+
+
+def filter_masks(
+    df: pd.DataFrame,
+    countries: list,
+    machines: list,
+    recipes: list,
+    only_one_day: bool,
+    dates: tuple[datetime.date, datetime.date],
+) -> pd.DataFrame:
+    """Filter like before the filter index, with masks over all rows."""
+    del only_one_day  # the synthetic data is never from the last day
+    return df.loc[
+        df[CocktailSchema.language].isin(countries)
+        & df[CocktailSchema.machine_name].isin(machines)
+        & df[CocktailSchema.cocktail_name].isin(recipes)
+        & (df[CocktailSchema.receivedate] >= pd.Timestamp(dates[0]))
+        & (df[CocktailSchema.receivedate] <= pd.Timestamp(dates[1]) + pd.Timedelta(days=1))
+    ]
+
+
+def baseline_sum_volume(df: pd.DataFrame, country_split: bool) -> pd.DataFrame:
+    grouping = [CocktailSchema.machine_name]
+    if country_split:
+        grouping = [CocktailSchema.language, CocktailSchema.machine_name]
+    volumes = (
+        df.groupby(grouping)[CocktailSchema.volume]
+        .agg(["sum", "count"])
+        .reset_index()
+        .sort_values(["sum", "count"], ascending=False)
+        .rename(columns={"sum": CocktailSchema.cocktail_volume, "count": CocktailSchema.cocktail_count})
+    )
+    volumes[CocktailSchema.cocktail_volume] = volumes[CocktailSchema.cocktail_volume] / 1000
+    return volumes
+
+
+def baseline_cocktail_count(df: pd.DataFrame, limit_recipe: int, country_split: bool) -> pd.DataFrame:
+    grouping = [CocktailSchema.cocktail_name]
+    if country_split:
+        grouping = [CocktailSchema.cocktail_name, CocktailSchema.language]
+    cocktails = (
+        df.groupby(grouping)[CocktailSchema.volume]
+        .count()
+        .reset_index()
+        .rename(columns={CocktailSchema.volume: CocktailSchema.cocktail_count})
+    )
+    if not country_split:
+        cocktails.sort_values([CocktailSchema.cocktail_count], ascending=False, inplace=True)
+        return cocktails.iloc[:limit_recipe]
+    name_order = (
+        df.groupby([CocktailSchema.cocktail_name])[CocktailSchema.volume]
+        .count()
+        .sort_values()
+        .index.to_list()[-limit_recipe:]
+    )
+    sorter_index = dict(zip(name_order, range(len(name_order)), strict=True))
+    cocktails["Rank"] = cocktails[CocktailSchema.cocktail_name].map(sorter_index)
+    cocktails.sort_values(["Rank", CocktailSchema.cocktail_count], ascending=False, inplace=True)
+    cocktails.dropna(axis=0, inplace=True)
+    cocktails.drop("Rank", axis=1, inplace=True)
+    return cocktails
+
+
+def baseline_time_aggregation(df: pd.DataFrame, hour_grouping: bool, machine_grouping: bool) -> pd.DataFrame:
+    date_grouper = pd.Grouper(key=CocktailSchema.receivedate, freq="1h" if hour_grouping else "1D")
+    grouping: list = [date_grouper]
+    if machine_grouping:
+        grouping = [date_grouper, CocktailSchema.machine_name]
+    time_df = (
+        df.groupby(grouping)[CocktailSchema.cocktail_name]
+        .count()
+        .reset_index()
+        .rename(columns={CocktailSchema.cocktail_name: CocktailSchema.cocktail_count})
+    )
+    return time_df[time_df[CocktailSchema.cocktail_count] != 0]
+
+
+def _round_to_base(x: float, base: int = 5) -> int:
+    return base * round(x / base)
+
+
+def baseline_serving_aggregation(df: pd.DataFrame, machine_split: bool, min_count: int) -> pd.DataFrame:
+    serving_df = df.copy(deep=True)
+    serving_df[CocktailSchema.volume] = serving_df[CocktailSchema.volume].apply(_round_to_base, args=(25,))
+    grouping = [CocktailSchema.volume]
+    if machine_split:
+        grouping = [CocktailSchema.machine_name, CocktailSchema.volume]
+    serving_df = (
+        serving_df.groupby(grouping)[CocktailSchema.language]
+        .agg(["count"])
+        .reset_index()
+        .sort_values([CocktailSchema.volume], ascending=True)
+        .rename(columns={"count": CocktailSchema.cocktail_count})
+    )
+    serving_size_count = serving_df.groupby(CocktailSchema.volume).sum()
+    volumes_to_keep = serving_size_count[serving_size_count[CocktailSchema.cocktail_count] >= min_count].index.to_list()
+    return serving_df[serving_df[CocktailSchema.volume].isin(volumes_to_keep)]
+
+
+def baseline_build_installation_df(received_df: pd.DataFrame) -> pd.DataFrame:
+    df = received_df.rename(
+        columns={
+            InstallationData.OS: InstallationSchema.OS,
+            InstallationData.RECEIVEDATE: InstallationSchema.RECEIVEDATE,
+        }
+    )
+    if not df.empty:
+        df[InstallationSchema.OS] = df[InstallationSchema.OS].str.replace(r"(Raspbian |Debian )", "Debian ", regex=True)
+        df[InstallationSchema.OS] = df[InstallationSchema.OS].str.replace(r"Armbian.*", "Armbian (all)", regex=True)
+        df = df[df[InstallationSchema.OS] != ""]
+    return df
+
+
+def baseline_aggregate_installations(df: pd.DataFrame) -> pd.DataFrame:
+    return (
+        df.groupby([InstallationSchema.OS])[InstallationSchema.RECEIVEDATE]
+        .count()
+        .reset_index()
+        .rename(columns={InstallationSchema.RECEIVEDATE: InstallationSchema.INSTALLATIONS_COUNT})
+        .sort_values([InstallationSchema.INSTALLATIONS_COUNT], ascending=False)
+    )
+
+
+def baseline_cumulate_installations(raw_df: pd.DataFrame, os_split: bool = False) -> pd.DataFrame:
+    df = raw_df.copy(deep=True)
+    df["counter"] = 1
+    grouping: list = [pd.Grouper(key=InstallationSchema.RECEIVEDATE, freq="W")]
+    if os_split:
+        grouping.insert(0, InstallationSchema.OS)
+    df = df.groupby(grouping).count().reset_index().rename(columns={"counter": InstallationSchema.INSTALLATIONS_COUNT})
+    if not os_split:
+        cumulative = df[InstallationSchema.INSTALLATIONS_COUNT].cumsum()
+    else:
+        cumulative = df.groupby([InstallationSchema.OS])[InstallationSchema.INSTALLATIONS_COUNT].cumsum()
+    df[InstallationSchema.INSTALLATIONS_COUNT] = cumulative
+    if not os_split:
+        return df[df[InstallationSchema.OS] != 0]
+    return (
+        pd.pivot_table(
+            df,
+            index=InstallationSchema.RECEIVEDATE,
+            columns=InstallationSchema.OS,
+            values=InstallationSchema.INSTALLATIONS_COUNT,
+        )
+        .sort_index()
+        .ffill()
+        .unstack()
+        .reset_index()
+        .rename(columns={0: InstallationSchema.INSTALLATIONS_COUNT})
+        .sort_values(by=[InstallationSchema.RECEIVEDATE, InstallationSchema.OS])
+        .dropna()
+    )
+
+
+def _filters(df: pd.DataFrame) -> dict[str, tuple]:
+    """Get the filter arguments of the measured filters: everything, the last week and a single machine."""
+    machines = sorted(df[CocktailSchema.machine_name].unique())
+    countries = sorted(df[CocktailSchema.language].unique())
+    recipes = sorted(df[CocktailSchema.cocktail_name].unique())
+    first, last = df[CocktailSchema.receivedate].min().date(), df[CocktailSchema.receivedate].max().date()
+    week = (last - datetime.timedelta(days=6), last)
+    return {
+        "filter_all": (countries, machines, recipes, False, (first, last)),
+        "filter_week": (countries, machines, recipes, False, week),
+        "filter_machine": (countries, machines[:1], recipes, False, (first, last)),
+    }
+
+
+def baseline_operations(df: pd.DataFrame) -> dict[str, Callable[[], Any]]:
+    """Get the operations of a dashboard page load, as they were before, on the previous layout."""
+    filters = {name: functools.partial(filter_masks, df, *arguments) for name, arguments in _filters(df).items()}
+    return {
+        "sidebar_options": lambda: [sorted(df[column].unique()) for column in data.CATEGORY_COLUMNS],
+        **filters,
+        # each view aggregated the rows on its own
+        "sum_volume": lambda: baseline_sum_volume(df, True),
+        "cocktail_count": lambda: baseline_cocktail_count(df, 10, True),
+        "time_aggregation": lambda: baseline_time_aggregation(df, False, True),
+        "serving_aggregation": lambda: baseline_serving_aggregation(df, True, 10),
+    }
+
+
+def operations(df: pd.DataFrame, index: data.FilterIndex) -> dict[str, Callable[[], Any]]:
+    """Get the operations of a dashboard page load, unwrapped from the streamlit cache."""
+    dataset = data.Dataset(df, "benchmark")
+    filters = {
+        name: functools.partial(data.filter_dataframe, index, *arguments) for name, arguments in _filters(df).items()
+    }
+    return {
+        "sidebar_options": lambda: [df[column].cat.categories.to_list() for column in data.CATEGORY_COLUMNS],
+        **filters,
+        "aggregation_cube": lambda: inspect.unwrap(data.aggregation_cube)(dataset),
+        # the views aggregate the cube, which is cached after the first call
+        "sum_volume": lambda: inspect.unwrap(data.sum_volume)(dataset, True),
+        "cocktail_count": lambda: inspect.unwrap(data.cocktail_count)(dataset, 10, True),
+        "time_aggregation": lambda: inspect.unwrap(data.time_aggregation)(dataset, False, True),
+        "serving_aggregation": lambda: inspect.unwrap(data.serving_aggregation)(dataset, True, 10),
+    }
+
+
+def baseline_installation_operations(received_df: pd.DataFrame) -> dict[str, Callable[[], Any]]:
+    """Get the operations on the installations as they were before, with the os names as plain strings."""
+    df = baseline_build_installation_df(received_df)
+    return {
+        "build_installation_df": lambda: baseline_build_installation_df(received_df),
+        "aggregate_installations": lambda: baseline_aggregate_installations(df),
+        "cumulate_installations": lambda: baseline_cumulate_installations(df, False),
+        "cumulate_installations_os": lambda: baseline_cumulate_installations(df, True),
+    }
+
+
+def installation_operations(received_df: pd.DataFrame) -> dict[str, Callable[[], Any]]:
+    """Get the operations on the installations, unwrapped from the streamlit cache."""
+    dataset = data.Dataset(data._build_installation_df(received_df), "benchmark")
+    return {
+        "build_installation_df": lambda: data._build_installation_df(received_df),
+        "aggregate_installations": lambda: inspect.unwrap(data.aggregate_installations)(dataset),
+        "cumulate_installations": lambda: inspect.unwrap(data.cumulate_installations)(dataset, False),
+        "cumulate_installations_os": lambda: inspect.unwrap(data.cumulate_installations)(dataset, True),
+    }
+
+
+def measure(operations: dict[str, Callable[[], Any]], repeats: int) -> dict[str, float]:
+    """Get the median time in ms and the peak of the allocated memory in MB of each operation."""
+    results = {}
+    for name, operation in operations.items():
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            operation()
+            timings.append(time.perf_counter() - started)
+        results[f"{name}_ms"] = round(statistics.median(timings) * 1000, 2)
+        tracemalloc.start()
+        operation()
+        results[f"{name}_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024**2, 2)
+        tracemalloc.stop()
+    return results
+
+
+def _memory(df: pd.DataFrame) -> dict[str, float]:
+    return {"memory_mb": round(df.memory_usage(deep=True).sum() / 1024**2, 2)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure the dashboard data handling with synthetic data.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of cocktails.")
+    parser.add_argument("--installations", type=int, default=1_000_000, help="Number of installations.")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs of each operation, the median is reported.")
+    parser.add_argument("--output", type=Path, help="File to write the results to.")
+    args = parser.parse_args()
+    content = received_cocktails(args.rows)
+    started = time.perf_counter()
+    compact = data._build_cocktail_df(data._read_arrow(content))
+    load_ms = round((time.perf_counter() - started) * 1000, 2)
+    started = time.perf_counter()
+    index = data.FilterIndex(compact, "benchmark")
+    index_ms = round((time.perf_counter() - started) * 1000, 2)
+    plain = plain_layout(compact)
+    installations = data._read_arrow(received_installations(args.installations))
+    plain_installations = installations.astype({InstallationData.OS: object})
+    results = {
+        "baseline": _memory(plain)
+        | measure(baseline_operations(plain) | baseline_installation_operations(plain_installations), args.repeats),
+        "compact": _memory(compact)
+        | measure(operations(compact, index) | installation_operations(installations), args.repeats)
+        | {"load_ms": load_ms, "index_ms": index_ms},
+    }
+    print(f"{'':<36}{'baseline':>12}{'compact':>12}{'ratio':>10}")
+    for key, after in results["compact"].items():
+        before = results["baseline"].get(key)
+        if before is None:
+            print(f"{key:<36}{'-':>12}{after:>12.2f}{'-':>10}")
+        else:
+            print(f"{key:<36}{before:>12.2f}{after:>12.2f}{after / before if before else 0:>10.2f}")
+    if args.output is not None:
+        args.output.write_text(json.dumps({"rows": args.rows, "results": results}, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from streamlit.logger import get_logger
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from urllib3.util import Retry
+
+# connect and read timeout in seconds
+TIMEOUT = (5, 30)
+POOL_SIZE = 10
+# waits about 0.5, 1 and 2 seconds (plus up to 0.5 seconds jitter) between the tries
+RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    backoff_jitter=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({"GET"}),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+logger = get_logger(__name__)
+
+
+class BackendClient:
+    """Session to the backend shared by all script runs, so the connections are kept open and reused."""
+
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=POOL_SIZE, max_retries=RETRY)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, path: str, params: dict | None = None, headers: dict | None = None) -> requests.Response | None:
+        """Get the path, retried on connection and server errors, None if the backend failed."""
+        started = time.perf_counter()
+        try:
+            response = self.session.get(f"{self.base_url}{path}", params=params, headers=headers, timeout=TIMEOUT)
+        except requests.RequestException as err:
+            logger.error("GET %s failed after %.0f ms: %s", path, (time.perf_counter() - started) * 1000, err)
+            return None
+        logger.info(
+            "GET %s: %s in %.0f ms, %s bytes",
+            path,
+            response.status_code,
+            (time.perf_counter() - started) * 1000,
+            len(response.content),
+        )
+        if response.status_code >= 400:  # noqa: PLR2004
+            logger.warning("Error from backend: %s: %s", response.status_code, response.text)
+            return None
+        return response
+
+
+_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="backend")
+
+
+def submit[T](call: Callable[[], T]) -> Future[T]:
+    """Run the call in a background thread, it can use the streamlit caches like the script itself."""
+    ctx = get_script_run_ctx()
+
+    def run() -> T:
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return call()
+
+    return _executor.submit(run)
@@ -1,45 +1,161 @@
 import datetime
-import json
+import hashlib
 import os
+import threading
 import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Any
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import requests
 import streamlit as st
 from dotenv import load_dotenv
-from requests.exceptions import ConnectionError as rConnectionError
-from requests.exceptions import ConnectTimeout, ReadTimeout
 from streamlit.logger import get_logger
 
-from .models import CocktailSchema, InstallationData, InstallationSchema, ReceivedData
+from .client import BackendClient, submit
+from .models import CocktailSchema, DataFrameStats, InstallationData, InstallationSchema, ReceivedData, SummaryData
 
 load_dotenv()
 is_dev = os.getenv("DEBUG") is not None
 backend_url = os.getenv("BACKEND_URL", "http://127.0.0.1:8000/api/v1")
-DATEFORMAT_STR = "%d/%m/%Y, %H:%M"
+WATERMARK_HEADER = "X-Watermark"
+ETAG_HEADER = "ETag"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+_FULL_RELOAD_SECONDS = 60 * 60
+# columns with only a few distinct values, kept as categoricals with sorted categories
+CATEGORY_COLUMNS = [CocktailSchema.language, CocktailSchema.machine_name, CocktailSchema.cocktail_name]
+# serving sizes are rounded to a multiple of this in ml by default
+SERVING_BUCKET = 25
 logger = get_logger(__name__)
+client = BackendClient(backend_url)
 
 
-def __myround(x: float, base: int = 5) -> int:
-    """Round to the nearest number to given base."""
-    return base * round(x / base)
+@dataclass(frozen=True)
+class Dataset:
+    """Data of one version, it is never changed but replaced by new data.
 
+    The caches identify the data only by the version, so the rows are not hashed on each call.
+    """
 
-@st.cache_data(ttl=60)
-def get_cocktails() -> pd.DataFrame:
-    """Get the data from deta and converts to df."""
-    # something in streamlit cloud seems to block the request, so we need to wait a bit
-    time.sleep(1)
-    cocktails = {}
-    try:
-        cocktails_response = requests.get(f"{backend_url}/public/cocktails", timeout=30)
-        if cocktails_response.ok:
-            cocktails = json.loads(cocktails_response.text)
-        else:
-            logger.warning("Error from backend: %s: %s", cocktails_response.status_code, cocktails_response.text)
-    except (ConnectTimeout, ReadTimeout, rConnectionError):
-        logger.error("Timeout when connecting to backend.")
-    df = pd.DataFrame(cocktails).rename(
+    df: pd.DataFrame
+    version: str
+
+
+# st.cache_data hashes the dataset arguments by this
+_BY_VERSION: dict[str | type, Callable[[Any], Any]] = {Dataset: lambda dataset: dataset.version}
+
+
+class FilterIndex:
+    """The cocktails sorted by date and the category codes of the names, built once for each version of the data.
+
+    A date range is a slice found by binary search and the selected names are looked up by their codes,
+    so filtering only touches the rows in the date range.
+    """
+
+    def __init__(self, df: pd.DataFrame, version: str, *, is_sorted: bool = False) -> None:
+        if not df.empty and not is_sorted:
+            df = df.sort_values(CocktailSchema.receivedate, kind="stable", ignore_index=True)
+        self.data = Dataset(df, version)
+        self.codes = {column: df[column].cat.codes.to_numpy() for column in CATEGORY_COLUMNS if column in df}
+
+
+class _CocktailStore:
+    """Keeps the parsed cocktail data and syncs only the new entries from the backend.
+
+    The entries after the watermark may still get older entries written before them, so they are sent again
+    with the next sync and skipped by their id.
+    The data is reloaded completely from time to time, so deleted entries vanish as well.
+    """
+
+    def __init__(self) -> None:
+        self.index = FilterIndex(pd.DataFrame(), "")
+        self.watermark: str | None = None
+        self.unsettled_ids = pa.array([], pa.string())
+        self.etag: str | None = None
+        self.loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def sync(self) -> FilterIndex:
+        """Get the new data since the last sync and append it to the existing one."""
+        with self._lock:
+            full_reload = self.watermark is None or time.monotonic() - self.loaded_at > _FULL_RELOAD_SECONDS
+            since = None if full_reload else self.watermark
+            params = {"since": since} if since is not None else {}
+            response = _request_arrow("/public/cocktails", params, self.etag)
+            if response is None or response.status_code == HTTPStatus.NOT_MODIFIED:
+                return self.index
+            table = _read_table(response.content)
+            self.watermark = response.headers.get(WATERMARK_HEADER, since)
+            self.etag = response.headers.get(ETAG_HEADER)
+            ids = table.column(ReceivedData.ID).combine_chunks()
+            if not full_reload:
+                table = table.filter(pc.invert(pc.is_in(ids, value_set=self.unsettled_ids)))
+            # the ids are ordered like the watermark, hex strings of the same length compare like the ids
+            self.unsettled_ids = ids.filter(pc.greater(ids, self.watermark)) if self.watermark else ids[:0]
+            new_df = _build_cocktail_df(_to_df(table.drop_columns([ReceivedData.ID])))
+            # the watermark does not change if cocktails got deleted, but the full reload time does
+            if full_reload:
+                self.loaded_at = time.monotonic()
+                self.index = FilterIndex(new_df, f"{self.watermark}@{self.loaded_at}")
+            elif not new_df.empty:
+                merged = _merge_cocktails(self.index.data.df, new_df)
+                self.index = FilterIndex(merged, f"{self.watermark}@{self.loaded_at}", is_sorted=True)
+            return self.index
+
+
+class _InstallationStore:
+    """Keeps the parsed installation data, which is only transferred again if it changed."""
+
+    def __init__(self) -> None:
+        self.data = Dataset(pd.DataFrame(), "")
+        self.etag: str | None = None
+        self._lock = threading.Lock()
+
+    def sync(self) -> Dataset:
+        with self._lock:
+            response = _request_arrow("/public/installations", {}, self.etag)
+            if response is None or response.status_code == HTTPStatus.NOT_MODIFIED:
+                return self.data
+            self.etag = response.headers.get(ETAG_HEADER)
+            # the etag changes with the data, it is only missing if the backend does not send one
+            version = self.etag or str(time.monotonic())
+            self.data = Dataset(_build_installation_df(_read_arrow(response.content)), version)
+            return self.data
+
+
+def _read_arrow(content: bytes) -> pd.DataFrame:
+    """Build the df from the arrow stream, the columns already got the right types."""
+    return _to_df(_read_table(content))
+
+
+def _read_table(content: bytes) -> pa.Table:
+    return pa.ipc.open_stream(content).read_all()
+
+
+def _to_df(table: pa.Table) -> pd.DataFrame:
+    """Convert the table, dictionary encoded columns become categoricals, the strings are not decoded for each row."""
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _request_arrow(path: str, params: dict, etag: str | None) -> requests.Response | None:
+    """Request the data as arrow stream, None if the backend failed.
+
+    The etag of the last response is sent along, so the backend answers with 304 if nothing changed.
+    """
+    headers = {"Accept": ARROW_MEDIA_TYPE}
+    if etag is not None:
+        headers["If-None-Match"] = etag
+    return client.get(path, params, headers)
+
+
+def _build_cocktail_df(received_df: pd.DataFrame) -> pd.DataFrame:
+    """Convert the received cocktails into the df used for the dashboard."""
+    df = received_df.rename(
         columns={
             ReceivedData.COUNTRYCODE: CocktailSchema.language,
             ReceivedData.MACHINENAME: CocktailSchema.machine_name,
@@ -48,114 +164,253 @@ def get_cocktails() -> pd.DataFrame:
             ReceivedData.RECEIVEDATE: CocktailSchema.receivedate,
         }
     )
-    if not df.empty:
-        df = df[  # pylint: disable=unsubscriptable-object
-            [
-                CocktailSchema.language,
-                CocktailSchema.machine_name,
-                CocktailSchema.cocktail_name,
-                CocktailSchema.volume,
-                CocktailSchema.receivedate,
-            ]
+    df = df[  # pylint: disable=unsubscriptable-object
+        [
+            CocktailSchema.language,
+            CocktailSchema.machine_name,
+            CocktailSchema.cocktail_name,
+            CocktailSchema.volume,
+            CocktailSchema.receivedate,
         ]
-        df[CocktailSchema.receivedate] = pd.to_datetime(df[CocktailSchema.receivedate], format=DATEFORMAT_STR)
-    return df
+    ]
+    return compact_cocktails(df)
+
+
+def compact_cocktails(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert the cocktails into the compact types the dashboard works with.
+
+    The names are categoricals with sorted categories, the volume is the smallest integer type holding all values.
+    """
+    columns = {column: _sorted_categories(df[column]) for column in CATEGORY_COLUMNS}
+    columns[CocktailSchema.volume] = pd.to_numeric(df[CocktailSchema.volume], downcast="integer")
+    columns[CocktailSchema.receivedate] = pd.to_datetime(df[CocktailSchema.receivedate])
+    return df.assign(**columns)
+
+
+def _sorted_categories(values: pd.Series) -> pd.Series:
+    # unordered categoricals count as same type regardless of the order, so astype would keep the order
+    categorical = values.astype("category").cat.remove_unused_categories()
+    return categorical.cat.reorder_categories(categorical.cat.categories.sort_values())
+
+
+def _merge_cocktails(df: pd.DataFrame, new_df: pd.DataFrame) -> pd.DataFrame:
+    """Merge the new cocktails into the ones sorted by date, the existing ones are neither sorted nor converted again.
+
+    Usually the new cocktails are newer than all others and are only appended, otherwise they are put at their place.
+    The categories of both are merged, the existing columns are only recoded if they got new names.
+    """
+    new_df = new_df.sort_values(CocktailSchema.receivedate, kind="stable", ignore_index=True)
+    dtypes = {}
+    for column in CATEGORY_COLUMNS:
+        categories = df[column].cat.categories
+        new_categories = new_df[column].cat.categories
+        if not new_categories.isin(categories).all():
+            categories = categories.union(new_categories)
+        dtypes[column] = pd.CategoricalDtype(categories)
+    changed = {column: dtype for column, dtype in dtypes.items() if dtype != df[column].dtype}
+    merged = pd.concat([df.astype(changed) if changed else df, new_df.astype(dtypes)], ignore_index=True)
+    dates = df[CocktailSchema.receivedate].to_numpy()
+    new_dates = new_df[CocktailSchema.receivedate].to_numpy()
+    if len(dates) == 0 or new_dates[0] >= dates[-1]:
+        return merged
+    # like a stable sort of both, the new cocktails go after the existing ones of the same date
+    new_positions = np.searchsorted(dates, new_dates, side="right") + np.arange(len(new_dates))
+    is_new = np.zeros(len(merged), dtype=bool)
+    is_new[new_positions] = True
+    order = np.empty(len(merged), dtype=np.intp)
+    order[new_positions] = np.arange(len(dates), len(merged))
+    order[~is_new] = np.arange(len(dates))
+    return merged.take(order).reset_index(drop=True)
+
+
+@st.cache_resource
+def _get_cocktail_store() -> _CocktailStore:
+    return _CocktailStore()
 
 
-@st.cache_data(ttl=600)
-def get_installations() -> pd.DataFrame:
-    installations = {}
-    try:
-        installations_response = requests.get(f"{backend_url}/public/installations", timeout=30)
-        if installations_response.ok:
-            installations = json.loads(installations_response.text)
-        else:
-            logger.warning(
-                "Error from backend: %s: %s",
-                installations_response.status_code,
-                installations_response.text,
-            )
-    except (ConnectTimeout, ReadTimeout, rConnectionError):
-        logger.error("Timeout when connecting to backend.")
-    df = pd.DataFrame(installations).rename(
+@st.cache_resource(ttl=60)
+def get_cocktails() -> FilterIndex:
+    """Get the indexed cocktail data from the backend, only new entries are transferred.
+
+    All sessions share the index, it is never changed but replaced for new data.
+    """
+    return _get_cocktail_store().sync()
+
+
+@st.cache_resource
+def _get_installation_store() -> _InstallationStore:
+    return _InstallationStore()
+
+
+@st.cache_resource(ttl=600)
+def get_installations() -> Dataset:
+    """Get the installation data from the backend, it is only transferred again if it changed.
+
+    All sessions share the data, it is never changed but replaced for new data.
+    """
+    return _get_installation_store().sync()
+
+
+def _build_installation_df(received_df: pd.DataFrame) -> pd.DataFrame:
+    """Convert the received installations into the df used for the dashboard."""
+    df = received_df.rename(
         columns={
             InstallationData.OS: InstallationSchema.OS,
             InstallationData.RECEIVEDATE: InstallationSchema.RECEIVEDATE,
         }
     )
     if not df.empty:
-        df[InstallationSchema.RECEIVEDATE] = pd.to_datetime(df[InstallationSchema.RECEIVEDATE], format=DATEFORMAT_STR)
-        # there may be the name Raspbian or Debian, for both the Raspberry Pi OS, so we need to unify them
-        df[InstallationSchema.OS] = df[InstallationSchema.OS].str.replace(r"(Raspbian |Debian )", "Debian ", regex=True)
-        # convert all entries of os having "Armbian" in the name to "Armbian"
-        df[InstallationSchema.OS] = df[InstallationSchema.OS].str.replace(r"Armbian.*", "Armbian (all)", regex=True)
+        df = df.assign(**{InstallationSchema.OS: _normalize_os(df[InstallationSchema.OS])})
         # it might be that there is an empty string for the os, we need to remove those
         df = df[df[InstallationSchema.OS] != ""]
+        df[InstallationSchema.OS] = df[InstallationSchema.OS].cat.remove_unused_categories()
     return df
 
 
-@st.cache_data(ttl=300)
+def _normalize_os(os_names: pd.Series) -> pd.Series:
+    """Unify the names of the os, as categorical. Only the distinct names are changed, not every row."""
+    categorical = os_names.astype("category")
+    # there may be the name Raspbian or Debian, for both the Raspberry Pi OS, so we need to unify them
+    names = categorical.cat.categories.str.replace(r"(Raspbian |Debian )", "Debian ", regex=True)
+    # convert all entries of os having "Armbian" in the name to "Armbian"
+    names = names.str.replace(r"Armbian.*", "Armbian (all)", regex=True)
+    categories = names.unique().sort_values()
+    # the code of missing names is -1, which takes the appended -1
+    codes = np.append(categories.get_indexer(names), -1)[categorical.cat.codes]
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=os_names.index, name=os_names.name)
+
+
+@st.cache_data(ttl=60)
+def get_summary() -> DataFrameStats:
+    """Get the overall numbers of the data, without the need to get all the data."""
+    response = client.get("/public/stats/summary")
+    if response is None:
+        return DataFrameStats(0, 0, 0, 0, 0, "No Data", "No Data", 0)
+    summary = response.json()
+    return DataFrameStats(
+        summary[SummaryData.LANGUAGES],
+        summary[SummaryData.MACHINES],
+        summary[SummaryData.RECIPES],
+        summary[SummaryData.COCKTAILS],
+        summary[SummaryData.VOLUME],
+        __build_date(summary[SummaryData.FIRST_DATE]),
+        __build_date(summary[SummaryData.LAST_DATE]),
+        summary[SummaryData.INSTALLATIONS],
+    )
+
+
+def load_data() -> tuple[FilterIndex, Dataset, DataFrameStats]:
+    """Get the cocktails, installations and summary at the same time, so a page load waits only for the slowest."""
+    cocktails = submit(get_cocktails)
+    installations = submit(get_installations)
+    summary = submit(get_summary)
+    return cocktails.result(), installations.result(), summary.result()
+
+
+def __build_date(checkdate: str | None) -> str:
+    if checkdate is None:
+        return "No Data"
+    parsed_date = datetime.datetime.fromisoformat(checkdate)
+    if parsed_date.date() == datetime.date.today():
+        return "today"
+    return parsed_date.strftime("%a, %d. %b %Y")
+
+
 def filter_dataframe(
-    df: pd.DataFrame,
+    index: FilterIndex,
     countries: list,
     machines: list,
     recipes: list,
     only_one_day: bool,
     dates: tuple[datetime.date, datetime.date],
-) -> pd.DataFrame:
-    """Apply the sidebar filter option to the data."""
-    filtered_df = df.loc[
-        df[CocktailSchema.language].isin(countries)
-        & df[CocktailSchema.machine_name].isin(machines)
-        & df[CocktailSchema.cocktail_name].isin(recipes)
-        & (df[CocktailSchema.receivedate] >= pd.Timestamp(dates[0]))
-        & (df[CocktailSchema.receivedate] <= pd.Timestamp(dates[1]) + pd.Timedelta(days=1))
-    ]
+) -> Dataset:
+    """Apply the sidebar filter option to the data, only the rows in the date range are checked.
+
+    The version of the result is made of the data version and the filter options.
+    """
+    filters = repr((countries, machines, recipes, only_one_day, dates)).encode()
+    version = f"{index.data.version}/{hashlib.md5(filters, usedforsecurity=False).hexdigest()}"
+    df = index.data.df
+    if df.empty:
+        return Dataset(df, version)
+    start = pd.Timestamp(dates[0])
     if only_one_day:
-        filtering = filtered_df[CocktailSchema.receivedate] >= (datetime.datetime.now() - datetime.timedelta(hours=24))  # type: ignore
-        filtered_df = filtered_df[filtering]
-    return filtered_df
+        start = max(start, pd.Timestamp.now() - pd.Timedelta(hours=24))
+    made_dates = df[CocktailSchema.receivedate]
+    first = made_dates.searchsorted(start, side="left")
+    last = made_dates.searchsorted(pd.Timestamp(dates[1]) + pd.Timedelta(days=1), side="right")
+    mask = np.ones(max(0, last - first), dtype=bool)
+    for column, selected in (
+        (CocktailSchema.language, countries),
+        (CocktailSchema.machine_name, machines),
+        (CocktailSchema.cocktail_name, recipes),
+    ):
+        categories = df[column].cat.categories
+        selected_codes = categories.get_indexer(selected)
+        is_selected = np.zeros(len(categories), dtype=bool)
+        is_selected[selected_codes[selected_codes >= 0]] = True
+        # usually everything is selected, then there is nothing to check
+        if not is_selected.all():
+            mask &= is_selected[index.codes[column][first:last]]
+    rows = df.iloc[first:last]
+    return Dataset(rows if mask.all() else rows[mask], version)
+
+
+def round_to_bucket(values: pd.Series, width: int) -> pd.Series:
+    """Round the values to the closest multiple of the width, as int64.
+
+    Rounding up may exceed the range of a small integer type, so the type of the values is not kept.
+    """
+    return (np.rint(values / width) * width).astype(np.int64)
+
+
+@st.cache_resource(ttl=300, max_entries=20, hash_funcs=_BY_VERSION)
+def aggregation_cube(dataset: Dataset, serving_bucket: int = SERVING_BUCKET) -> Dataset:
+    """Count and volume of the cocktails by hour, machine, recipe, language and serving size, in one pass.
 
+    All views of the cocktail data are aggregations of this cube, so the rows are only grouped once for each filter.
+    The volume column is the serving size rounded to the bucket width, the cocktail volume is in ml.
+    """
+    df = dataset.df
+    volumes = df[CocktailSchema.volume]
+    serving_sizes = round_to_bucket(volumes, serving_bucket)
+    keys = [df[CocktailSchema.receivedate].dt.floor("h"), *(df[column] for column in CATEGORY_COLUMNS), serving_sizes]
+    # the volume is stored as small integer, the sum needs a larger one
+    cube = (
+        volumes.astype(np.int64)
+        .groupby(keys, observed=True, sort=False, dropna=False)
+        .agg(**{CocktailSchema.cocktail_count: "size", CocktailSchema.cocktail_volume: "sum"})
+        .reset_index()
+    )
+    return Dataset(cube, dataset.version)
 
-@st.cache_data(ttl=300)
-def sum_volume(df: pd.DataFrame, country_split: bool) -> pd.DataFrame:
+
+@st.cache_data(ttl=300, hash_funcs=_BY_VERSION)
+def sum_volume(dataset: Dataset, country_split: bool) -> pd.DataFrame:
     """Aggregate by language and machine Name, returns total volumes and cocktail counts."""
+    cube = aggregation_cube(dataset).df
     grouping = [CocktailSchema.machine_name]
     if country_split:
         grouping = [CocktailSchema.language, CocktailSchema.machine_name]
     volumes = (
-        df.groupby(grouping)[CocktailSchema.volume]  # type: ignore
-        .agg(["sum", "count"])
+        cube.groupby(grouping, observed=True)[[CocktailSchema.cocktail_volume, CocktailSchema.cocktail_count]]
+        .sum()
         .reset_index()
-        .sort_values(["sum", "count"], ascending=False)
-        .rename(
-            columns={
-                "sum": CocktailSchema.cocktail_volume,
-                "count": CocktailSchema.cocktail_count,
-            }
-        )
+        .sort_values([CocktailSchema.cocktail_volume, CocktailSchema.cocktail_count], ascending=False)
     )
     volumes[CocktailSchema.cocktail_volume] = volumes[CocktailSchema.cocktail_volume] / 1000
     return volumes
 
 
-@st.cache_data(ttl=300)
-def cocktail_count(df: pd.DataFrame, limit_recipe: int, country_split: bool) -> pd.DataFrame:
+@st.cache_data(ttl=300, hash_funcs=_BY_VERSION)
+def cocktail_count(dataset: Dataset, limit_recipe: int, country_split: bool) -> pd.DataFrame:
     """Aggregate by language and cocktail name, limits to x most used recipes."""
+    cube = aggregation_cube(dataset).df
     grouping = [CocktailSchema.cocktail_name]
     if country_split:
         grouping = [CocktailSchema.cocktail_name, CocktailSchema.language]
     # first group by the restrictions, this needs to be done in both cases
-    cocktails = (
-        df.groupby(grouping)[CocktailSchema.volume]  # type: ignore
-        .count()
-        .reset_index()
-        .rename(
-            columns={
-                CocktailSchema.volume: CocktailSchema.cocktail_count,
-            }
-        )
-    )
+    cocktails = cube.groupby(grouping, observed=True)[CocktailSchema.cocktail_count].sum().reset_index()
     # if no split, the logic is quite simple, just sort and limit them
     if not country_split:
         cocktails.sort_values([CocktailSchema.cocktail_count], ascending=False, inplace=True)
@@ -163,72 +418,57 @@ def cocktail_count(df: pd.DataFrame, limit_recipe: int, country_split: bool) ->
     # If split by country, for the listing, we need to generate a tmp rank
     # that we can order by that rank for the cocktail name (its dependant on total count)
     name_order = (
-        df.groupby([CocktailSchema.cocktail_name])[CocktailSchema.volume]
-        .count()
+        cocktails.groupby([CocktailSchema.cocktail_name], observed=True)[CocktailSchema.cocktail_count]
+        .sum()
         .sort_values()
         .index.to_list()[-limit_recipe:]
     )
     sorter_index = dict(zip(name_order, range(len(name_order))))
-    cocktails["Rank"] = cocktails[CocktailSchema.cocktail_name].map(sorter_index)
+    cocktails["Rank"] = cocktails[CocktailSchema.cocktail_name].astype(str).map(sorter_index)
     cocktails.sort_values(["Rank", CocktailSchema.cocktail_count], ascending=False, inplace=True)
     cocktails.dropna(axis=0, inplace=True)
     cocktails.drop("Rank", axis=1, inplace=True)
     return cocktails
 
 
-@st.cache_data(ttl=300)
-def time_aggregation(df: pd.DataFrame, hour_grouping: bool, machine_grouping: bool) -> pd.DataFrame:
+@st.cache_data(ttl=300, hash_funcs=_BY_VERSION)
+def time_aggregation(dataset: Dataset, hour_grouping: bool, machine_grouping: bool) -> pd.DataFrame:
     """Aggregate the data either by day or hour, depending on the last_day param."""
-    freq = "1D"
-    if hour_grouping:
-        freq = "1h"
-    date_grouper = pd.Grouper(key=CocktailSchema.receivedate, freq=freq)
-    grouping = [date_grouper]
+    cube = aggregation_cube(dataset).df
+    dates = cube[CocktailSchema.receivedate]
+    if not hour_grouping:
+        dates = dates.dt.floor("D")
+    grouping = [dates]
     if machine_grouping:
-        grouping = [date_grouper, CocktailSchema.machine_name]
-    time_df = (
-        df.groupby(grouping)[CocktailSchema.cocktail_name]  # type: ignore
-        .count()
-        .reset_index()
-        .rename(
-            columns={
-                CocktailSchema.cocktail_name: CocktailSchema.cocktail_count,
-            }
-        )
-    )
-    return time_df[time_df[CocktailSchema.cocktail_count] != 0]
+        grouping = [dates, cube[CocktailSchema.machine_name]]
+    return cube.groupby(grouping, observed=True)[CocktailSchema.cocktail_count].sum().reset_index()
 
 
-@st.cache_data(ttl=300)
-def serving_aggregation(df: pd.DataFrame, machine_split: bool, min_count: int) -> pd.DataFrame:
-    """Aggregate by serving sizes."""
-    # rounds to the closest 25
-    serving_df = df.copy(deep=True)
-    serving_df[CocktailSchema.volume] = serving_df[CocktailSchema.volume].apply(__myround, args=(25,))
+@st.cache_data(ttl=300, hash_funcs=_BY_VERSION)
+def serving_aggregation(
+    dataset: Dataset, machine_split: bool, min_count: int, bucket_width: int = SERVING_BUCKET
+) -> pd.DataFrame:
+    """Aggregate by serving sizes, rounded to the bucket width."""
+    cube = aggregation_cube(dataset, bucket_width).df
     grouping = [CocktailSchema.volume]
     if machine_split:
         grouping = [CocktailSchema.machine_name, CocktailSchema.volume]
     serving_df = (
-        serving_df.groupby(grouping)[CocktailSchema.language]  # type: ignore
-        .agg(["count"])
+        cube.groupby(grouping, observed=True)[CocktailSchema.cocktail_count]
+        .sum()
         .reset_index()
         .sort_values([CocktailSchema.volume], ascending=True)
-        .rename(
-            columns={
-                "count": CocktailSchema.cocktail_count,
-            }
-        )
     )
     # for multiple grouping needs to calculate the sum per group and only include the ones having more than min
-    serving_size_count = serving_df.groupby(CocktailSchema.volume).sum()
-    volumes_to_keep = serving_size_count[serving_size_count[CocktailSchema.cocktail_count] >= min_count].index.to_list()
+    serving_size_count = serving_df.groupby(CocktailSchema.volume)[CocktailSchema.cocktail_count].sum()
+    volumes_to_keep = serving_size_count[serving_size_count >= min_count].index.to_list()
     return serving_df[serving_df[CocktailSchema.volume].isin(volumes_to_keep)]
 
 
-@st.cache_data(ttl=300)
-def aggregate_installations(df: pd.DataFrame) -> pd.DataFrame:
+@st.cache_data(ttl=300, hash_funcs=_BY_VERSION)
+def aggregate_installations(dataset: Dataset) -> pd.DataFrame:
     return (
-        df.groupby([InstallationSchema.OS])[InstallationSchema.RECEIVEDATE]
+        dataset.df.groupby([InstallationSchema.OS], observed=True)[InstallationSchema.RECEIVEDATE]
         .count()
         .reset_index()
         .rename(
@@ -240,51 +480,38 @@ def aggregate_installations(df: pd.DataFrame) -> pd.DataFrame:
     )
 
 
-@st.cache_data(ttl=300)
-def cumulate_installations(raw_df: pd.DataFrame, os_split: bool = False) -> pd.DataFrame:
-    """Group the installations by week and returns the count."""
-    df = raw_df.copy(deep=True)
-    df["counter"] = 1
-    grouping = [pd.Grouper(key=InstallationSchema.RECEIVEDATE, freq="w")]
-    # also need to group by os if needed
-    if os_split:
-        grouping.insert(0, InstallationSchema.OS)  # type: ignore
-    df = (
-        df.groupby(grouping)
-        .count()
-        .reset_index()
-        .rename(
-            columns={
-                "counter": InstallationSchema.INSTALLATIONS_COUNT,
+def _week_ends(dates: pd.Series) -> pd.Series:
+    # the sundays ending the weeks, like the labels of a weekly grouper
+    days = dates.to_numpy().astype("datetime64[D]")
+    # the first day of the epoch was a thursday, monday is 0 like in pandas
+    weekdays = (days.astype(np.int64) + 3) % 7
+    return pd.Series(days + (6 - weekdays), index=dates.index, name=dates.name)
+
+
+@st.cache_data(ttl=300, hash_funcs=_BY_VERSION)
+def cumulate_installations(dataset: Dataset, os_split: bool = False) -> pd.DataFrame:
+    """Count the installations by week, returns the total count at each week with installations."""
+    df = dataset.df
+    weeks = _week_ends(df[InstallationSchema.RECEIVEDATE])
+    if not os_split:
+        counts = weeks.value_counts().sort_index()
+        return pd.DataFrame(
+            {
+                InstallationSchema.RECEIVEDATE: counts.index,
+                InstallationSchema.INSTALLATIONS_COUNT: counts.cumsum().to_numpy(),
             }
         )
-    )
-    # need to aggregate the cumsum accordingly
-    if not os_split:
-        cumulative = df[InstallationSchema.INSTALLATIONS_COUNT].cumsum()
-    else:
-        cumulative = df.groupby([InstallationSchema.OS])[InstallationSchema.INSTALLATIONS_COUNT].cumsum()
-    df[InstallationSchema.INSTALLATIONS_COUNT] = cumulative
-    # in case of os split, there need to be filled in missing data in the grid,
-    # as well as reshape the data to make plotly a happy format
-    if not os_split:
-        # if aggregating by time interval, there may be days where the installations is 0
-        # so we drop those, where OS is zero
-        # installation count got contains the cumulative sum, so this will not be used
-        # due to the count aggregation, the os got a number as well, we use this
-        return df[df[InstallationSchema.OS] != 0]
+    counts = pd.DataFrame({InstallationSchema.OS: df[InstallationSchema.OS], InstallationSchema.RECEIVEDATE: weeks})
+    cumulative = counts.value_counts().unstack(InstallationSchema.OS, fill_value=0).sort_index().cumsum()
+    # plotly needs the long format, an os is only included from its first installation on
     return (
-        pd.pivot_table(
-            df,
-            index=InstallationSchema.RECEIVEDATE,
-            columns=InstallationSchema.OS,
-            values=InstallationSchema.INSTALLATIONS_COUNT,
-        )
-        .sort_index()
-        .ffill()
-        .unstack()
+        cumulative.where(cumulative > 0)
         .reset_index()
-        .rename(columns={0: InstallationSchema.INSTALLATIONS_COUNT})
-        .sort_values(by=[InstallationSchema.RECEIVEDATE, InstallationSchema.OS])
+        .melt(
+            id_vars=InstallationSchema.RECEIVEDATE,
+            var_name=InstallationSchema.OS,
+            value_name=InstallationSchema.INSTALLATIONS_COUNT,
+        )
         .dropna()
+        .sort_values(by=[InstallationSchema.RECEIVEDATE, InstallationSchema.OS], ignore_index=True)
     )
@@ -11,6 +11,7 @@ class DataFrameStats:
     volume: int
     first_data: str
     last_data: str
+    installations: int
 
 
 class CocktailSchema:
@@ -24,6 +25,7 @@ class CocktailSchema:
 
 
 class ReceivedData:
+    ID = "_id"
     COUNTRYCODE = "countrycode"
     MACHINENAME = "machinename"
     COCKTAILNAME = "cocktailname"
@@ -34,6 +36,16 @@ class InstallationData:
     OS = "os"
     RECEIVEDATE = "receivedate"
 
+class SummaryData:
+    COCKTAILS = "cocktails"
+    VOLUME = "volume"
+    FIRST_DATE = "first_date"
+    LAST_DATE = "last_date"
+    MACHINES = "machines"
+    RECIPES = "recipes"
+    LANGUAGES = "languages"
+    INSTALLATIONS = "installations"
+
 class InstallationSchema:
     OS = "Operating System"
     RECEIVEDATE = "Registered Date"
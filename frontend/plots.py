@@ -36,12 +36,21 @@ _DEF_ST_COLORS = [
 ]
 
 
-@st.cache_data(ttl=3600)
 def _get_machine_color_map(df: pd.DataFrame) -> dict[str, str]:
-    machines: list[str] = sorted(df[CocktailSchema.machine_name].unique())
+    return _machine_color_map(tuple(df[CocktailSchema.machine_name].unique()))
+
+
+@st.cache_data(ttl=3600)
+def _machine_color_map(machine_names: tuple[str, ...]) -> dict[str, str]:
+    machines = sorted(machine_names)
     return {m: _DEF_ST_COLORS[i % len(_DEF_ST_COLORS)] for i, m in enumerate(machines)}
 
 
+def _plain_names(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert the categorical columns to strings, plotly can not build the treemap hierarchy of categoricals."""
+    return df.astype(dict.fromkeys(df.select_dtypes("category").columns, str))
+
+
 def generate_volume_treemap(df: pd.DataFrame, country_split: bool = True) -> None:
     """Use the language an machine name agg df to generate a treemap."""
     path = [px.Constant("Machines"), CocktailSchema.machine_name]
@@ -49,7 +58,7 @@ def generate_volume_treemap(df: pd.DataFrame, country_split: bool = True) -> Non
         path = [px.Constant("Language used"), CocktailSchema.language, CocktailSchema.machine_name]
 
     fig = px.treemap(
-        df,
+        _plain_names(df),
         path=path,
         values=CocktailSchema.cocktail_volume,
         height=_TREEMAP_HEIGHT,
@@ -75,7 +84,7 @@ def generate_recipes_treemap(df: pd.DataFrame, country_split: bool = True) -> No
         path = [px.Constant("Recipes"), CocktailSchema.cocktail_name, CocktailSchema.language]
         texttemplate = "<b>%{parent}</b> <i>x</i>%{value:.0f}<br>(%{label})"
         hovertemplate = "%{parent} (%{label})<br>Recipe made: %{value:,.0f}<i>x</i>"
-    fig = px.treemap(df, path=path, values=CocktailSchema.cocktail_count, height=_TREEMAP_HEIGHT)
+    fig = px.treemap(_plain_names(df), path=path, values=CocktailSchema.cocktail_count, height=_TREEMAP_HEIGHT)
     fig.update_layout({"margin": {"l": 0, "r": 0, "t": 0, "b": 0}})
     fig.update_traces(texttemplate=texttemplate, hovertemplate=hovertemplate)
     st.plotly_chart(fig, width="stretch", config={"displayModeBar": False})
@@ -220,7 +229,7 @@ def generate_installation_time_chart(df: pd.DataFrame, os_split: bool = False) -
 def generate_installation_treemap(df: pd.DataFrame) -> None:
     """Use the language an machine name agg df to generate a treemap."""
     path = [px.Constant("OS"), InstallationSchema.OS]
-    fig = px.treemap(df, path=path, values=InstallationSchema.INSTALLATIONS_COUNT, height=_TREEMAP_HEIGHT)
+    fig = px.treemap(_plain_names(df), path=path, values=InstallationSchema.INSTALLATIONS_COUNT, height=_TREEMAP_HEIGHT)
     fig.update_layout({"margin": {"l": 0, "r": 0, "t": 0, "b": 0}})
     fig.update_traces(
         texttemplate="<b>%{label}</b><br>%{value:,.0f} Installation(s)",
@@ -7,16 +7,16 @@ from ..models import CocktailSchema
 LANGUAGE_SPLIT_DESC = "Split by Language Used"
 
 
-def display_data(filtered_df: pd.DataFrame, recipes_limit: int, last_day: bool) -> None:
+def display_data(filtered: data.Dataset, recipes_limit: int, last_day: bool) -> None:
     """Generate all the data views (plots and tables) from the data."""
-    if filtered_df.empty:
+    if filtered.df.empty:
         __say_no_data()
         return
-    __show_filtered_size(filtered_df, last_day)
-    __show_recipe_data(filtered_df, recipes_limit)
-    __show_time_stats(filtered_df, last_day)
-    __show_volume_stats(filtered_df)
-    __show_serving_size(filtered_df)
+    __show_filtered_size(filtered.df, last_day)
+    __show_recipe_data(filtered, recipes_limit)
+    __show_time_stats(filtered, last_day)
+    __show_volume_stats(filtered)
+    __show_serving_size(filtered)
 
 
 def __show_filtered_size(filtered_df: pd.DataFrame, last_day: bool) -> None:
@@ -30,37 +30,37 @@ def __show_filtered_size(filtered_df: pd.DataFrame, last_day: bool) -> None:
     st.success(f"Today, **{amount_cocktails}** {cocktail_str} {phrasing} produced 🥳")
 
 
-def __show_recipe_data(filtered_df: pd.DataFrame, recipes_limit: int) -> None:
+def __show_recipe_data(filtered: data.Dataset, recipes_limit: int) -> None:
     """Display Recipes count by recipe and country."""
     st.header("🧾 Recipes Made")
     country_split = st.checkbox(LANGUAGE_SPLIT_DESC, False, key="country_recipe")
-    recipe_df = data.cocktail_count(filtered_df, recipes_limit, country_split)
+    recipe_df = data.cocktail_count(filtered, recipes_limit, country_split)
     plots.generate_recipes_treemap(recipe_df, country_split)
     header_addition = " and Language used" if country_split else ""
     with st.expander(f"[Table] Aggregated by {CocktailSchema.cocktail_name}{header_addition}:"):
         st.table(recipe_df)
 
 
-def __show_time_stats(filtered_df: pd.DataFrame, last_day: bool) -> None:
+def __show_time_stats(filtered: data.Dataset, last_day: bool) -> None:
     """Display Cocktail count over time."""
     st.header("⏱️ Data Over Time")
     hour_grouping, machine_grouping = __define_granularity(last_day)
-    time_df = data.time_aggregation(filtered_df, hour_grouping, machine_grouping)
+    time_df = data.time_aggregation(filtered, hour_grouping, machine_grouping)
     plots.generate_time_plot(time_df, machine_grouping)
 
 
-def __show_volume_stats(filtered_df: pd.DataFrame) -> None:
+def __show_volume_stats(filtered: data.Dataset) -> None:
     """Lets the user decide to also split by country code."""
     st.header("🍸 Volume and Number of Cocktails")
     country_split = st.checkbox(LANGUAGE_SPLIT_DESC, False, key="country_machine")
-    volume_df = data.sum_volume(filtered_df, country_split)
+    volume_df = data.sum_volume(filtered, country_split)
     plots.generate_volume_treemap(volume_df, country_split)
     header_addition = " Language used and" if country_split else ""
     with st.expander(f"[Table] Aggregated by{header_addition} {CocktailSchema.machine_name}:"):
         st.table(volume_df.style.format({CocktailSchema.cocktail_volume: "{:.2f}"}))
 
 
-def __show_serving_size(filtered_df: pd.DataFrame) -> None:
+def __show_serving_size(filtered: data.Dataset) -> None:
     """Show stats over the prepared volume choices."""
     st.header("🥃 Serving Sizes")
     col1, col2 = st.columns(2)
@@ -68,7 +68,7 @@ def __show_serving_size(filtered_df: pd.DataFrame) -> None:
     # only make it available if no machine split is activated
     max_value_possible = 10
     min_servings: int = col2.slider("Filter Minimal Serving Count", 0, max_value_possible, 5)
-    serving_df = data.serving_aggregation(filtered_df, machine_split, min_servings)
+    serving_df = data.serving_aggregation(filtered, machine_split, min_servings)
     plots.generate_serving_size_bars(serving_df, machine_split)
 
 
@@ -100,18 +100,18 @@ def __say_no_data() -> None:
     )
 
 
-def display_installations(df: pd.DataFrame) -> None:
+def display_installations(installations: data.Dataset) -> None:
     """Show the installation data over time and distribution."""
     st.header("📦 Installation Data")
-    if df.empty:
+    if installations.df.empty:
         st.info("Currently no installation data available. Maybe it's time to install your onw! ✨")
         return
     st.write("Installation Count over Time")
     os_split = st.checkbox("Split by OS")
-    over_time_df = data.cumulate_installations(df, os_split)
+    over_time_df = data.cumulate_installations(installations, os_split)
     plots.generate_installation_time_chart(over_time_df, os_split)
     st.write("Installation Distribution")
-    distribution_df = data.aggregate_installations(df)
+    distribution_df = data.aggregate_installations(installations)
     plots.generate_installation_treemap(distribution_df)
     with st.expander("[Table] Installation Distribution"):
         st.table(distribution_df)
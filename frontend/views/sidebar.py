@@ -1,9 +1,9 @@
-from datetime import date, datetime
+from datetime import date
 
 import pandas as pd
 import streamlit as st
 
-from ..models import CocktailSchema, DataFrameStats
+from ..models import CocktailSchema
 
 
 def generate_sidebar(
@@ -15,45 +15,34 @@ def generate_sidebar(
     int,
     bool,
     tuple[date, date] | tuple[None, None],
-    DataFrameStats,
 ]:
     """Generate the sidebar with the option. Returns needed variables."""
     st.sidebar.subheader("🔍 Filter CocktailBerry Data")
     st.sidebar.write("Here you can limit the data and filter it.")
     if df.empty:
         st.sidebar.write("Nothing to do, need some data ...")
-        return [], [], [], 1, False, (None, None), DataFrameStats(0, 0, 0, 0, 0, "No Data", "No Data")
+        return [], [], [], 1, False, (None, None)
     st.sidebar.subheader("Filter Options")
     st.sidebar.caption("For your Party")
     only_one_day = st.sidebar.checkbox("Only Show last 24h Data", _get_partymode())
     st.sidebar.caption("Basic Settings")
-    country_selection: list[str] = sorted(df[CocktailSchema.language].unique())
+    # the categories are sorted and only contain the names used in the data
+    country_selection: list[str] = list(df[CocktailSchema.language].cat.categories)
     country_codes = st.sidebar.multiselect("Choose Used Languages:", country_selection, country_selection)
-    machine_selection: list[str] = sorted(df[CocktailSchema.machine_name].unique())
+    machine_selection: list[str] = list(df[CocktailSchema.machine_name].cat.categories)
     machines = st.sidebar.multiselect("Choose Machines:", machine_selection, machine_selection)
-    recipes_selection: list[str] = sorted(df[CocktailSchema.cocktail_name].unique())
+    recipes_selection: list[str] = list(df[CocktailSchema.cocktail_name].cat.categories)
     recipes_limit = st.sidebar.slider(
         "Show x most Popular Recipes:", 2, max(2, len(recipes_selection)), min(10, len(recipes_selection))
     )
-    min_date = datetime.date(min(df[CocktailSchema.receivedate]))
-    max_date = datetime.date(max(df[CocktailSchema.receivedate]))
+    min_date = df[CocktailSchema.receivedate].min().date()
+    max_date = df[CocktailSchema.receivedate].max().date()
     with st.sidebar.expander("Advanced Settings"):
         start_date = st.date_input("Start Date", value=min_date)
         end_date = st.date_input("End Date", value=max_date)
         dates = (start_date, end_date)
         recipes = st.multiselect("Choose Recipes:", recipes_selection, recipes_selection)
-    # also generates the needed data out of the df
-    # since we got unique calculation already here (to save some compute things)
-    df_stats = DataFrameStats(
-        len(country_selection),
-        len(machine_selection),
-        len(recipes_selection),
-        len(df),
-        df[CocktailSchema.volume].sum() / 1000,
-        _build_date(df[CocktailSchema.receivedate].min()),
-        _build_date(df[CocktailSchema.receivedate].max()),
-    )
-    return country_codes, machines, recipes, recipes_limit, only_one_day, dates, df_stats
+    return country_codes, machines, recipes, recipes_limit, only_one_day, dates
 
 
 def _get_partymode() -> bool:
@@ -61,10 +50,3 @@ def _get_partymode() -> bool:
     q_params = st.query_params.to_dict()
     partymode = q_params.get("partymode")
     return partymode is not None and partymode.lower() == "true"
-
-
-def _build_date(checkdate: datetime) -> str:
-    yyyymmddfmt = "%a, %d. %b %Y"
-    if checkdate.date() == datetime.today().date():
-        return "today"
-    return checkdate.strftime(yyyymmddfmt)
@@ -1,7 +1,7 @@
 import streamlit as st
 
 from frontend import views
-from frontend.data import filter_dataframe, get_cocktails, get_installations
+from frontend.data import filter_dataframe, load_data
 from frontend.styles import generate_style
 
 st.set_page_config(
@@ -16,17 +16,16 @@ st.set_page_config(
 )
 generate_style()
 
-cocktails = get_cocktails()
-installations = get_installations()
-installation_count = len(installations)
-country_codes, machines, recipes, recipes_limit, only_one_day, dates, df_stats = views.generate_sidebar(cocktails)
-views.display_introduction(df_stats, installation_count)
+cocktail_index, installations, summary = load_data()
+cocktails = cocktail_index.data.df
+country_codes, machines, recipes, recipes_limit, only_one_day, dates = views.generate_sidebar(cocktails)
+views.display_introduction(summary)
 
 # skip this part if there is no data
 if cocktails.empty:
     st.info("Currently no data available. Let CocktailBerry send some data! ✨")
 else:
-    filtered_cocktails = filter_dataframe(cocktails, country_codes, machines, recipes, only_one_day, dates)  # type: ignore
+    filtered_cocktails = filter_dataframe(cocktail_index, country_codes, machines, recipes, only_one_day, dates)  # type: ignore
     views.display_data(filtered_cocktails, recipes_limit, only_one_day)  # type: ignore
 views.api_guidelines()
 views.display_machine_types()